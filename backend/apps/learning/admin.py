@@ -1,4 +1,5 @@
 from django.contrib import admin
+from django.db import transaction
 from django.urls import path
 from django.shortcuts import render, redirect
 from django.contrib import messages
@@ -7,6 +8,7 @@ from .models import (
     SubjectGroup, Subject, ExamYear, ExamSession, Question, Choice, Word, FlashCard, Video, StudyText,
     SubjectItem, Chapter, Page, UserProgress,
     KotobaCategory, KotobaSubcategory, KotobaWord, KotobaExample, KotobaVocabulary, UserWordProgress,
+    KotobaSubcategoryPayload,
     FlashcardDeck, FlashcardCard, UserFlashcardProgress
 )
 from .forms import DataImportForm
@@ -137,35 +139,68 @@ class UserProgressAdmin(admin.ModelAdmin):
     ordering = ['-last_accessed']
 
 # Kotoba Admin
+class KotobaPayloadAdminMixin:
+    """Rebuild the precomputed subcategory payloads touched by an admin edit"""
+    # Lookup from the edited model to KotobaSubcategory.id
+    payload_subcategory_lookup = 'subcategory_id'
+
+    def _payload_subcategory_ids(self, queryset):
+        return {pk for pk in queryset.values_list(self.payload_subcategory_lookup, flat=True) if pk is not None}
+
+    def _rebuild_payloads(self, subcategory_ids):
+        if subcategory_ids:
+            transaction.on_commit(lambda: KotobaSubcategoryPayload.rebuild(subcategory_ids))
+
+    def save_model(self, request, obj, form, change):
+        # Include the old subcategory in case the edit moved the row
+        before = self._payload_subcategory_ids(self.model.objects.filter(pk=obj.pk)) if change else set()
+        super().save_model(request, obj, form, change)
+        self._rebuild_payloads(before | self._payload_subcategory_ids(self.model.objects.filter(pk=obj.pk)))
+
+    def delete_model(self, request, obj):
+        subcategory_ids = self._payload_subcategory_ids(self.model.objects.filter(pk=obj.pk))
+        super().delete_model(request, obj)
+        self._rebuild_payloads(subcategory_ids)
+
+    def delete_queryset(self, request, queryset):
+        subcategory_ids = self._payload_subcategory_ids(queryset)
+        super().delete_queryset(request, queryset)
+        self._rebuild_payloads(subcategory_ids)
+
 @admin.register(KotobaCategory)
-class KotobaCategoryAdmin(admin.ModelAdmin):
+class KotobaCategoryAdmin(KotobaPayloadAdminMixin, admin.ModelAdmin):
+    payload_subcategory_lookup = 'subcategories__id'
     list_display = ['japanese_name', 'category_key', 'indonesian_translation', 'order_number', 'created_at']
     search_fields = ['japanese_name', 'category_key', 'indonesian_translation']
     ordering = ['order_number', 'japanese_name']
 
 @admin.register(KotobaSubcategory)
-class KotobaSubcategoryAdmin(admin.ModelAdmin):
+class KotobaSubcategoryAdmin(KotobaPayloadAdminMixin, admin.ModelAdmin):
+    payload_subcategory_lookup = 'id'
     list_display = ['japanese_name', 'subcategory_key', 'main_category', 'indonesian_translation', 'order_number']
     list_filter = ['main_category']
     search_fields = ['japanese_name', 'subcategory_key']
     ordering = ['main_category__order_number', 'order_number']
 
 @admin.register(KotobaWord)
-class KotobaWordAdmin(admin.ModelAdmin):
+class KotobaWordAdmin(KotobaPayloadAdminMixin, admin.ModelAdmin):
+    payload_subcategory_lookup = 'subcategory_id'
     list_display = ['japanese_word', 'word_id', 'main_category', 'subcategory', 'indonesian_translation']
     list_filter = ['main_category', 'subcategory']
     search_fields = ['japanese_word', 'word_id', 'indonesian_translation']
     ordering = ['main_category__order_number', 'subcategory__order_number', 'japanese_word']
 
 @admin.register(KotobaExample)
-class KotobaExampleAdmin(admin.ModelAdmin):
+class KotobaExampleAdmin(KotobaPayloadAdminMixin, admin.ModelAdmin):
+    payload_subcategory_lookup = 'word__subcategory_id'
     list_display = ['example_id', 'word', 'japanese_example', 'order_number']
     list_filter = ['word__main_category']
     search_fields = ['example_id', 'japanese_example', 'indonesian_example']
     ordering = ['word', 'order_number']
 
 @admin.register(KotobaVocabulary)
-class KotobaVocabularyAdmin(admin.ModelAdmin):
+class KotobaVocabularyAdmin(KotobaPayloadAdminMixin, admin.ModelAdmin):
+    payload_subcategory_lookup = 'example__word__subcategory_id'
     list_display = ['japanese_word', 'vocabulary_id', 'example', 'indonesian_translation']
     search_fields = ['japanese_word', 'indonesian_translation']
     ordering = ['example__word', 'japanese_word']
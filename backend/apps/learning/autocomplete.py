@@ -0,0 +1,138 @@
+"""
+Prefix autocomplete over Kotoba readings, words and Indonesian glosses
+
+Keys (normalized like the search index) are kept in one sorted array so a
+prefix is a bisect range. Top-k is precomputed at build time for every prefix
+whose range holds more than RANGE_SCAN_LIMIT keys, whatever its length
+(common stems like mem-/ber-/men- included); every other prefix is ranked on
+the fly over at most RANGE_SCAN_LIMIT keys. The built structure is stored in
+the shared cache under the Kotoba content generation, so workers load it
+instead of rebuilding it, and each worker keeps its own read-only copy in
+memory.
+"""
+import heapq
+import time
+from bisect import bisect_left
+from os.path import commonprefix
+
+from django.db.models import Sum
+
+from .kotoba_cache import cached_fill, kotoba_cache_key
+from .models import KotobaWord, UserWordProgress
+from .search import normalize
+
+CACHE_NAME = 'kotoba_autocomplete'
+MAX_SUGGESTIONS = 20
+RANGE_SCAN_LIMIT = 256  # Prefixes matching more keys than this get a precomputed top-k
+POPULARITY_TTL = 600  # Review counts are re-aggregated at most this often
+RELOAD_INTERVAL = 60  # How often a worker checks the shared cache for a newer build
+
+
+class Autocompleter:
+    """Read-only sorted-array autocomplete ranked by popularity"""
+
+    def __init__(self, words, popularity):
+        """
+        words: iterable of (word_id, japanese_word, ruby_reading, indonesian_translation)
+        popularity: {word_id: score}
+        """
+        self.words = {}
+        entries = []
+        for word_id, japanese, ruby, indonesian in words:
+            self.words[word_id] = (japanese, ruby, indonesian)
+            score = popularity.get(word_id, 0)
+            keys = {normalize(japanese), normalize(ruby)}
+            # Every token suffix of the gloss, so typing any of its words matches
+            tokens = normalize(indonesian).split(' ')
+            keys.update(' '.join(tokens[i:]) for i in range(len(tokens)))
+            entries.extend((key, score, word_id) for key in keys if key)
+
+        entries.sort()
+        self.keys = [key for key, _, _ in entries]
+        self.scores = [score for _, score, _ in entries]
+        self.word_ids = [word_id for _, _, word_id in entries]
+        self.built_at = time.time()
+
+        # A prefix shared by keys[i] and keys[i + RANGE_SCAN_LIMIT] spans more than
+        # RANGE_SCAN_LIMIT keys; the set is prefix-closed (a heavy prefix's prefixes are heavy)
+        heavy = set()
+        for i in range(len(self.keys) - RANGE_SCAN_LIMIT):
+            shared = commonprefix((self.keys[i], self.keys[i + RANGE_SCAN_LIMIT]))
+            for length in range(len(shared), 0, -1):
+                if shared[:length] in heavy:
+                    break
+                heavy.add(shared[:length])
+
+        # Top words for every heavy prefix, most popular first
+        self.top = {}
+        for index in sorted(range(len(entries)), key=lambda i: (-self.scores[i], self.keys[i])):
+            key, word_id = self.keys[index], self.word_ids[index]
+            for length in range(1, len(key) + 1):
+                prefix = key[:length]
+                if prefix not in heavy:
+                    break
+                top = self.top.setdefault(prefix, [])
+                if len(top) < MAX_SUGGESTIONS and word_id not in top:
+                    top.append(word_id)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def suggest(self, prefix, limit=10):
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        limit = min(limit, MAX_SUGGESTIONS)
+
+        if prefix in self.top:
+            word_ids = self.top[prefix][:limit]
+        else:
+            # Not precomputed, so the range holds at most RANGE_SCAN_LIMIT keys
+            lo = bisect_left(self.keys, prefix)
+            hi = bisect_left(self.keys, prefix + '\uffff', lo)
+            ranked = heapq.nlargest(
+                limit * 3, range(lo, hi), key=lambda i: (self.scores[i], -len(self.keys[i]))
+            )
+            word_ids = []
+            for index in ranked:
+                word_id = self.word_ids[index]
+                if word_id not in word_ids:
+                    word_ids.append(word_id)
+                    if len(word_ids) == limit:
+                        break
+
+        return [
+            {
+                'word_id': word_id,
+                'japanese': self.words[word_id][0],
+                'ruby': self.words[word_id][1],
+                'indonesian': self.words[word_id][2],
+            }
+            for word_id in word_ids
+        ]
+
+
+def build_autocompleter():
+    popularity = dict(
+        UserWordProgress.objects.values('word_id')
+        .annotate(total=Sum('review_count'))
+        .values_list('word_id', 'total')
+    )
+    words = KotobaWord.objects.values_list('word_id', 'japanese_word', 'ruby_reading', 'indonesian_translation')
+    return Autocompleter(words.iterator(), popularity)
+
+
+_current = None  # (cache key, Autocompleter, monotonic time of last check)
+
+
+def get_autocompleter():
+    """This worker's copy, reloaded from the shared cache when content or popularity changes"""
+    global _current
+    key = kotoba_cache_key(CACHE_NAME)
+    now = time.monotonic()
+    if _current and _current[0] == key and now - _current[2] < RELOAD_INTERVAL:
+        return _current[1]
+
+    instance = cached_fill(CACHE_NAME, build_autocompleter, timeout=POPULARITY_TTL)
+    _current = (key, instance, now)
+    return instance
@@ -0,0 +1,136 @@
+"""
+Furigana (ruby) annotation engine
+
+Every known (surface -> reading) pair, from the ルビマッピング CSV and the
+ruby_reading fields of the Kotoba / legacy word tables, is compiled into one
+longest-match automaton (apps.translations.matcher.DictionaryMatcher). Text is
+annotated in a single pass; each surface's <ruby> markup is rendered once at
+build time, aligned so that okurigana stay outside the ruby group.
+"""
+import csv
+import os
+import re
+import time
+
+from django.conf import settings
+from django.utils.html import escape
+
+from apps.translations.cache import LRUCache
+from apps.translations.matcher import DictionaryMatcher
+from .kotoba_cache import get_generation
+from .models import KotobaWord, KotobaVocabulary, Word
+
+RUBY_MAPPING_FILE = os.path.join(settings.BASE_DIR, 'data', 'ことば', 'ことば7. ルビマッピング.csv')
+RELOAD_INTERVAL = 60  # How often a worker checks whether Kotoba content changed
+
+_RUBY_PAIR = re.compile(r'<ruby>(.+?)<rt>(.+?)</rt></ruby>')
+_KANJI_CLASS = '[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff々〆ヶ]'
+_KANJI = re.compile(_KANJI_CLASS)
+_KANJI_RUNS = re.compile(f'({_KANJI_CLASS}+)')
+
+
+def render_ruby(surface, reading):
+    """
+    <ruby> markup for one surface form. Kana inside the surface are matched
+    against the reading so only kanji runs get a reading (起き上がり ->
+    起<rt>お</rt>き上<rt>あ</rt>がり); falls back to one group if they don't line up.
+    """
+    parts = _KANJI_RUNS.split(surface)
+    pattern = ''.join('(.+?)' if i % 2 else re.escape(part) for i, part in enumerate(parts))
+    match = re.fullmatch(pattern, reading)
+    if not match:
+        return f'<ruby>{escape(surface)}<rt>{escape(reading)}</rt></ruby>'
+
+    readings = iter(match.groups())
+    return ''.join(
+        f'<ruby>{escape(part)}<rt>{escape(next(readings))}</rt></ruby>' if i % 2 else escape(part)
+        for i, part in enumerate(parts)
+    )
+
+
+def load_ruby_mapping(path=RUBY_MAPPING_FILE):
+    """(surface, reading) pairs from the <ruby> markup in the ルビマッピング CSV"""
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r', encoding='utf-8') as f:
+        return [
+            pair
+            for row in csv.DictReader(f)
+            for pair in _RUBY_PAIR.findall(row.get('ruby_text') or '')
+        ]
+
+
+def collect_pairs():
+    """{surface: reading}; earlier sources win (CSV, Kotoba words, Kotoba vocabulary, legacy words)"""
+    sources = [
+        load_ruby_mapping(),
+        KotobaWord.objects.values_list('japanese_word', 'ruby_reading'),
+        KotobaVocabulary.objects.values_list('japanese_word', 'ruby_reading'),
+        Word.objects.exclude(reading='').values_list('japanese', 'reading'),
+    ]
+    pairs = {}
+    for source in sources:
+        for surface, reading in source:
+            surface, reading = surface.strip(), reading.strip()
+            # Only surfaces with kanji need furigana
+            if surface and reading and surface != reading and _KANJI.search(surface):
+                pairs.setdefault(surface, reading)
+    return pairs
+
+
+class FuriganaAnnotator:
+    """Longest-match <ruby> annotator with an LRU cache of annotated strings"""
+
+    def __init__(self, pairs, cache_entries=5000, cache_bytes=8 * 1024 * 1024):
+        self.matcher = DictionaryMatcher({
+            surface: render_ruby(surface, reading) for surface, reading in pairs.items()
+        })
+        self.cache = LRUCache(max_entries=cache_entries, max_bytes=cache_bytes)
+
+    def __len__(self):
+        return len(self.matcher)
+
+    def annotate(self, text, use_cache=True):
+        """HTML-escaped text with every known surface wrapped in <ruby> markup"""
+        if not text:
+            return ''
+        if use_cache:
+            cached = self.cache.get(text)
+            if cached is not None:
+                return cached
+
+        parts = []
+        position = 0
+        for start, end, markup in self.matcher.iter_matches(text):
+            parts.append(escape(text[position:start]))
+            parts.append(markup)
+            position = end
+        parts.append(escape(text[position:]))
+        annotated = ''.join(parts)
+
+        if use_cache:
+            self.cache.set(text, annotated)
+        return annotated
+
+
+_current = None  # (Kotoba generation, FuriganaAnnotator, monotonic time of last check)
+
+
+def get_annotator():
+    """This worker's annotator, rebuilt when the Kotoba content generation changes"""
+    global _current
+    now = time.monotonic()
+    if _current and now - _current[2] < RELOAD_INTERVAL:
+        return _current[1]
+
+    generation = get_generation()
+    if _current and _current[0] == generation:
+        annotator = _current[1]
+    else:
+        annotator = FuriganaAnnotator(collect_pairs())
+    _current = (generation, annotator, now)
+    return annotator
+
+
+def annotate(text):
+    return get_annotator().annotate(text)
@@ -0,0 +1,80 @@
+"""
+Generation-keyed caching for Kotoba content
+
+Every Kotoba cache key embeds a content generation number that is bumped
+(after commit) whenever a Kotoba row is saved or deleted, so edits are visible
+on the next request and entries can live for a long time. Fills are
+single-flight: one worker rebuilds a missing entry while the others serve the
+last value built for any generation.
+"""
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+GENERATION_KEY = 'kotoba_generation'
+KOTOBA_CACHE_TIMEOUT = 7 * 24 * 3600  # Edits invalidate through the generation, not the TTL
+FILL_LOCK_TIMEOUT = 30
+FILL_WAIT_SECONDS = 2.0
+
+
+def get_generation():
+    """Current content generation (initialised from the clock so a cache flush never reuses old numbers)"""
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        cache.add(GENERATION_KEY, int(time.time()), timeout=None)
+        generation = cache.get(GENERATION_KEY)
+    return generation
+
+
+def bump_generation():
+    """Invalidate every Kotoba cache entry by moving to a new generation"""
+    try:
+        return cache.incr(GENERATION_KEY)
+    except ValueError:
+        get_generation()
+        return cache.incr(GENERATION_KEY)
+
+
+def bump_generation_on_commit():
+    """Bump when the current transaction commits (immediately outside a transaction)"""
+    transaction.on_commit(bump_generation)
+
+
+def kotoba_cache_key(name, generation=None):
+    return f'{name}:g{generation if generation is not None else get_generation()}'
+
+
+def cached_fill(name, builder, timeout=KOTOBA_CACHE_TIMEOUT):
+    """
+    Read-through cache for Kotoba data keyed on the current generation.
+    On a miss only the worker holding the fill lock calls builder(); the
+    others return the last built value (any generation) or wait briefly.
+    """
+    key = kotoba_cache_key(name)
+    value = cache.get(key)
+    if value is not None:
+        return value
+
+    stale_key = f'{name}:latest'
+    lock_key = f'{key}:lock'
+    if cache.add(lock_key, 1, timeout=FILL_LOCK_TIMEOUT):
+        try:
+            value = builder()
+            cache.set_many({key: value, stale_key: value}, timeout=timeout)
+        finally:
+            cache.delete(lock_key)
+        return value
+
+    stale = cache.get(stale_key)
+    if stale is not None:
+        return stale
+
+    # Nothing to serve yet: wait for the filling worker, then fall back to building it ourselves
+    deadline = time.monotonic() + FILL_WAIT_SECONDS
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        value = cache.get(key)
+        if value is not None:
+            return value
+    return builder()
@@ -0,0 +1,68 @@
+import random
+import time
+from django.core.management.base import BaseCommand, CommandError
+from apps.learning.autocomplete import Autocompleter
+
+# Indonesian affixes and stems, so glosses cluster on mem-/ber-/men- like the real data
+PREFIXES = ['mem', 'ber', 'men', 'meng', 'pe', 'ter', 'di', 'ke', '']
+STEMS = [
+    'bantu', 'bersih', 'bawa', 'buat', 'makan', 'minum', 'mandi', 'jalan', 'tidur', 'rawat',
+    'angkat', 'ganti', 'periksa', 'ukur', 'tulis', 'baca', 'dengar', 'lihat', 'pakai', 'buka',
+]
+QUERIES = ['m', 'me', 'mem', 'ber', 'men', 'meng', 'pe', 'ter', 'memb', 'bera', 'mena', 'ma', 'ke']
+
+
+class Command(BaseCommand):
+    help = 'Measure autocomplete build time and lookup latency on a synthetic Kotoba-sized vocabulary'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--words', type=int, default=100000, help='Number of synthetic words')
+        parser.add_argument('--queries', type=int, default=5000, help='Number of prefix lookups')
+        parser.add_argument('--target-ms', type=float, default=5.0, help='Fail when p99 latency exceeds this')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+
+        def gloss():
+            return ' '.join(rng.choice(PREFIXES) + rng.choice(STEMS) for _ in range(rng.randint(1, 4)))
+
+        words = [
+            (word_id, f'語{word_id}', f'ご{word_id}', gloss())
+            for word_id in range(1, options['words'] + 1)
+        ]
+        popularity = {word_id: int(rng.paretovariate(1.2)) for word_id, *_ in words}
+
+        build_started = time.perf_counter()
+        autocompleter = Autocompleter(words, popularity)
+        build_ms = (time.perf_counter() - build_started) * 1000
+        self.stdout.write(
+            f'Built {len(autocompleter)} keys ({len(autocompleter.top)} precomputed prefixes) in {build_ms:.0f} ms'
+        )
+
+        # Common stems plus random prefixes cut from real keys
+        prefixes = [rng.choice(QUERIES) for _ in range(options['queries'] // 2)]
+        prefixes += [
+            key[:rng.randint(1, min(len(key), 8))]
+            for key in rng.sample(autocompleter.keys, options['queries'] - len(prefixes))
+        ]
+        rng.shuffle(prefixes)
+
+        timings = []
+        for prefix in prefixes:
+            started = time.perf_counter()
+            autocompleter.suggest(prefix, limit=10)
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        p50 = timings[len(timings) // 2]
+        p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+        worst = max(timings)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(prefixes)} lookups\n'
+            f'  p50: {p50:.3f} ms\n'
+            f'  p99: {p99:.3f} ms\n'
+            f'  max: {worst:.3f} ms'
+        ))
+        if p99 > options['target_ms']:
+            raise CommandError(f'p99 {p99:.3f} ms exceeds the {options["target_ms"]} ms target')
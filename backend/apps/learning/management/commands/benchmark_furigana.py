@@ -0,0 +1,56 @@
+import random
+import time
+from django.core.management.base import BaseCommand
+from django.utils.html import strip_tags
+from apps.learning.furigana import FuriganaAnnotator, collect_pairs
+from apps.learning.models import KotobaExample, Question
+
+
+class Command(BaseCommand):
+    help = 'Measure furigana annotation throughput on exam-length passages'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--passages', type=int, default=500, help='Number of passages to annotate')
+        parser.add_argument('--length', type=int, default=400, help='Approximate characters per passage')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        build_started = time.perf_counter()
+        annotator = FuriganaAnnotator(collect_pairs())
+        build_ms = (time.perf_counter() - build_started) * 1000
+        self.stdout.write(f'Compiled {len(annotator)} surface forms in {build_ms:.1f} ms')
+
+        # Passages stitched together from real sentences (exam questions and Kotoba examples)
+        sentences = [strip_tags(text) for text in Question.objects.values_list('question_text', flat=True)]
+        sentences += list(KotobaExample.objects.values_list('japanese_example', flat=True))
+        sentences = [sentence for sentence in sentences if sentence]
+        if not sentences:
+            self.stdout.write(self.style.WARNING('No questions or examples to build passages from'))
+            return
+
+        rng = random.Random(options['seed'])
+        passages = []
+        for _ in range(options['passages']):
+            passage = ''
+            while len(passage) < options['length']:
+                passage += rng.choice(sentences)
+            passages.append(passage)
+        total_chars = sum(len(passage) for passage in passages)
+
+        started = time.perf_counter()
+        for passage in passages:
+            annotator.annotate(passage, use_cache=False)
+        uncached = time.perf_counter() - started
+
+        for passage in passages:
+            annotator.annotate(passage)
+        started = time.perf_counter()
+        for passage in passages:
+            annotator.annotate(passage)
+        cached = time.perf_counter() - started
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(passages)} passages, {total_chars} chars\n'
+            f'  uncached: {uncached * 1000 / len(passages):.3f} ms/passage, {total_chars / uncached / 1e6:.2f} M chars/s\n'
+            f'  cached:   {cached * 1000 / len(passages):.3f} ms/passage'
+        ))
@@ -0,0 +1,120 @@
+import time
+from datetime import timedelta
+from itertools import islice
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from apps.learning.models import FlashcardReviewLog, FlashcardDeck, SchedulerParameters
+from apps.users.models import User
+from apps.learning import optimizer
+
+LOG_COLUMNS = ['grade', 'repetitions', 'interval_days', 'elapsed_days']
+
+
+class Command(BaseCommand):
+    help = 'Fit per-deck or per-user SM-2 multipliers from the flashcard review log'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scope',
+            choices=['deck', 'user'],
+            default='deck',
+            help='Fit one parameter set per deck or per user'
+        )
+        parser.add_argument(
+            '--min-reviews',
+            type=int,
+            default=500,
+            help='Reviews a group needs before its multipliers are changed'
+        )
+        parser.add_argument(
+            '--days',
+            type=int,
+            help='Only use reviews from the last N days'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=100000,
+            help='Rows fetched from the database per round-trip'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Print the fitted multipliers without saving them'
+        )
+
+    def handle(self, *args, **options):
+        group_field = f"{options['scope']}_id"
+        started = time.monotonic()
+
+        reviews = FlashcardReviewLog.objects.all()
+        if options['days']:
+            reviews = reviews.filter(reviewed_at__gte=timezone.now() - timedelta(days=options['days']))
+
+        self.stdout.write('Loading review log...')
+        rows = reviews.values_list(group_field, *LOG_COLUMNS).iterator(chunk_size=options['chunk_size'])
+        chunks = []
+        while True:
+            chunk = list(islice(rows, options['chunk_size']))
+            if not chunk:
+                break
+            chunks.append(np.array(chunk, dtype=np.int64))
+        if not chunks:
+            raise CommandError('The review log is empty')
+        data = np.concatenate(chunks)
+        loaded = time.monotonic()
+        self.stdout.write(f'Loaded {len(data)} reviews in {loaded - started:.1f}s')
+
+        group_keys, groups = np.unique(data[:, 0], return_inverse=True)
+        scope_filter = {'user__isnull': True} if options['scope'] == 'deck' else {'deck__isnull': True}
+        existing = {
+            getattr(parameters, group_field): parameters
+            for parameters in SchedulerParameters.objects.filter(**scope_filter, **{f'{group_field}__in': group_keys.tolist()})
+        }
+        current = np.array([
+            (existing[key].ease_multiplier, existing[key].interval_multiplier) if key in existing else (1.0, 1.0)
+            for key in group_keys.tolist()
+        ])
+
+        multipliers, counts = optimizer.fit_multipliers(
+            groups, len(group_keys), data[:, 1], data[:, 2], data[:, 3], data[:, 4], current, options['min_reviews']
+        )
+        fitted = time.monotonic()
+        self.stdout.write(f'Fitted {len(group_keys)} {options["scope"]}s in {fitted - loaded:.1f}s')
+
+        # The log keeps rows of deleted users and decks; those have nothing to save parameters for
+        scope_model = FlashcardDeck if options['scope'] == 'deck' else User
+        live_keys = set(scope_model.objects.filter(pk__in=group_keys.tolist()).values_list('pk', flat=True))
+
+        to_create, to_update = [], []
+        for key, (ease_multiplier, interval_multiplier), count in zip(group_keys.tolist(), multipliers.tolist(), counts.tolist()):
+            if options['verbosity'] > 1 or options['dry_run']:
+                self.stdout.write(
+                    f'{options["scope"]} {key}: ease x{ease_multiplier:.3f}  interval x{interval_multiplier:.3f}  ({count} reviews)'
+                )
+            if key not in live_keys:
+                continue
+            parameters = existing.get(key) or SchedulerParameters(**{group_field: key})
+            parameters.ease_multiplier = ease_multiplier
+            parameters.interval_multiplier = interval_multiplier
+            parameters.review_count = count
+            parameters.fitted_at = timezone.now()
+            (to_update if parameters.pk else to_create).append(parameters)
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING('Dry run: nothing saved'))
+            return
+
+        with transaction.atomic():
+            SchedulerParameters.objects.bulk_create(to_create)
+            SchedulerParameters.objects.bulk_update(
+                to_update, ['ease_multiplier', 'interval_multiplier', 'review_count', 'fitted_at']
+            )
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Saved parameters for {len(to_create) + len(to_update)} {options["scope"]}s '
+            f'({len(to_create)} new) in {time.monotonic() - started:.1f}s'
+        ))
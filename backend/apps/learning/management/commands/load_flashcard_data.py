@@ -1,115 +1,188 @@
 """
 Management command to load Kotoba data into Flashcard decks
-Creates one deck per subcategory with all words and examples
+Creates one deck per main category with all words and examples
+
+Decks and cards are upserted on a stable source key (category key / word_id),
+so re-running keeps card ids, and with them UserFlashcardProgress, and only
+rewrites rows whose content changed.
 """
+import time
 from django.core.management.base import BaseCommand
 from django.db import transaction
 from apps.learning.models import (
-    KotobaCategory, KotobaSubcategory, KotobaWord, KotobaExample,
+    KotobaCategory, KotobaWord, KotobaExample,
     FlashcardDeck, FlashcardCard
 )
-import csv
-import os
-from django.conf import settings
+from apps.learning.sync import sync_write_window
+
+# Deck type based on main category
+DECK_TYPE_MAP = {
+    'care_study': 'caregiving',
+    'work': 'vocabulary',
+    'conversation': 'vocabulary',
+    'songs_anime': 'vocabulary',
+    'casual_language': 'vocabulary',
+    'n2_study': 'grammar',
+    'n3_study': 'grammar',
+}
+DECK_FIELDS = ['name', 'deck_type', 'description', 'order']
+CARD_FIELDS = [
+    'deck_id', 'front_text', 'back_text', 'front_reading', 'example_sentence',
+    'example_translation', 'notes', 'order',
+]
 
 
 class Command(BaseCommand):
     help = 'Load Kotoba data into Flashcard decks'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Rows per bulk upsert statement'
+        )
+
     def handle(self, *args, **options):
         self.stdout.write('Starting flashcard data import...')
-
-        # Get all main categories
-        categories = KotobaCategory.objects.all().order_by('order_number')
-
-        deck_count = 0
-        card_count = 0
-
-        with transaction.atomic():
-            for category in categories:
-                # Create ONE deck for this main category
-                deck_name = category.japanese_name
-
-                # Determine deck type based on main category
-                deck_type_map = {
-                    'care_study': 'caregiving',
-                    'work': 'vocabulary',
-                    'conversation': 'vocabulary',
-                    'songs_anime': 'vocabulary',
-                    'casual_language': 'vocabulary',
-                    'n2_study': 'grammar',
-                    'n3_study': 'grammar',
+        batch_size = options['batch_size']
+        started = last = time.monotonic()
+        timings = []
+
+        def lap(label):
+            nonlocal last
+            now = time.monotonic()
+            timings.append((label, now - last))
+            last = now
+
+        # Read the source tables once
+        categories = list(KotobaCategory.objects.order_by('order_number').values(
+            'category_key', 'japanese_name', 'indonesian_translation', 'order_number'
+        ))
+        words = list(
+            KotobaWord.objects.order_by('subcategory__order_number', 'japanese_word')
+            .values_list('word_id', 'main_category_id', 'japanese_word', 'indonesian_translation',
+                         'ruby_reading', 'subcategory__japanese_name')
+        )
+        examples = {}
+        for word_id, japanese, indonesian in KotobaExample.objects.order_by('word_id', 'order_number').values_list(
+            'word_id', 'japanese_example', 'indonesian_example'
+        ):
+            examples.setdefault(word_id, []).append(f"• {japanese}\n  {indonesian}")
+        lap('read source')
+
+        # Held until the commit so delta sync does not skip the rows written here
+        with sync_write_window(), transaction.atomic():
+            decks = {
+                category['category_key']: {
+                    'name': category['japanese_name'],
+                    'deck_type': DECK_TYPE_MAP.get(category['category_key'], 'vocabulary'),
+                    'description': category['indonesian_translation'],
+                    'order': category['order_number'],
+                }
+                for category in categories
+            }
+            deck_created, deck_updated = self.upsert(
+                FlashcardDeck, decks, DECK_FIELDS, batch_size,
+                legacy_key=lambda deck: deck.name,
+                source_legacy_key=lambda fields: fields['name'],
+            )
+            deck_ids = dict(
+                FlashcardDeck.objects.filter(source_key__in=decks).values_list('source_key', 'id')
+            )
+            lap('upsert decks')
+
+            cards = {}
+            card_orders = {}
+            for word_id, category_key, japanese, indonesian, reading, subcategory_name in words:
+                if category_key not in deck_ids:
+                    continue
+                deck_id = deck_ids[category_key]
+                card_orders[deck_id] = card_orders.get(deck_id, -1) + 1
+                cards[word_id] = {
+                    'deck_id': deck_id,
+                    'front_text': japanese,
+                    'back_text': indonesian,
+                    'front_reading': reading,
+                    'example_sentence': "\n\n".join(examples.get(word_id, [])),
+                    'example_translation': "",  # Already included in example_sentence
+                    'notes': subcategory_name,  # Just the subcategory name
+                    'order': card_orders[deck_id],
                 }
+            card_created, card_updated = self.upsert(
+                FlashcardCard, cards, CARD_FIELDS, batch_size,
+                legacy_key=lambda card: (card.deck_id, card.front_text, card.front_reading),
+                source_legacy_key=lambda fields: (fields['deck_id'], fields['front_text'], fields['front_reading']),
+                legacy_filter={'deck_id__in': deck_ids.values()},
+            )
+
+            # Cards in loaded decks whose word is gone (or that never matched a word)
+            stale = FlashcardCard.objects.filter(deck_id__in=deck_ids.values()).exclude(source_key__in=cards)
+            card_deleted = stale.count()
+            if card_deleted:
+                stale.delete()
+            lap('upsert cards')
+
+            # Bulk writes skip the counter signals
+            FlashcardDeck.recount_cards(list(deck_ids.values()))
+            lap('recount')
 
-                deck_type = deck_type_map.get(
-                    category.category_key,
-                    'vocabulary'
-                )
-
-                # Check if deck already exists
-                deck, created = FlashcardDeck.objects.get_or_create(
-                    name=deck_name,
-                    defaults={
-                        'deck_type': deck_type,
-                        'description': category.indonesian_translation,
-                        'is_premium': False,
-                        'is_active': True,
-                        'order': category.order_number
-                    }
-                )
-
-                if created:
-                    deck_count += 1
-                    self.stdout.write(f'  Created deck: {deck_name}')
-                else:
-                    self.stdout.write(f'  Deck already exists: {deck_name}')
-                    # Clear existing cards for reimport
-                    FlashcardCard.objects.filter(deck=deck).delete()
-
-                # Get all words in this main category (across ALL subcategories)
-                words = KotobaWord.objects.filter(
-                    main_category=category
-                ).select_related('subcategory').prefetch_related('examples').order_by('subcategory__order_number', 'japanese_word')
-
-                # Create flashcard for each word
-                card_order = 0
-                for word in words:
-                    # Get all examples for this word
-                    examples = word.examples.all().order_by('order_number')
-
-                    if examples.exists():
-                        # Combine all examples into back text
-                        example_texts = []
-                        for ex in examples:
-                            example_texts.append(
-                                f"• {ex.japanese_example}\n  {ex.indonesian_example}"
-                            )
-
-                        example_text = "\n\n".join(example_texts)
-                    else:
-                        example_text = ""
-
-                    # Create flashcard
-                    card = FlashcardCard.objects.create(
-                        deck=deck,
-                        front_text=word.japanese_word,
-                        back_text=word.indonesian_translation,
-                        front_reading=word.ruby_reading,
-                        example_sentence=example_text,
-                        example_translation="",  # Already included in example_sentence
-                        notes=f"{word.subcategory.japanese_name}",  # Just the subcategory name
-                        order=card_order
-                    )
-
-                    card_order += 1
-                    card_count += 1
-
-                self.stdout.write(f'    Added {card_order} cards to deck')
+        for label, seconds in timings:
+            self.stdout.write(f'  {label:<14} {seconds:6.2f}s')
 
         self.stdout.write(
             self.style.SUCCESS(
-                f'\nImport complete!\n'
-                f'  Decks created/updated: {deck_count}\n'
-                f'  Total cards: {card_count}'
+                f'\nImport complete in {time.monotonic() - started:.2f}s!\n'
+                f'  Decks: {len(decks)} ({deck_created} created, {deck_updated} updated)\n'
+                f'  Cards: {len(cards)} ({card_created} created, {card_updated} updated, {card_deleted} deleted)'
+            )
+        )
+
+    def upsert(self, model, source, field_names, batch_size, legacy_key, source_legacy_key, legacy_filter=None):
+        """
+        bulk_create(update_conflicts=True) on source_key for the rows of {source_key: fields}
+        that are new or changed. Rows from before source keys existed are first matched
+        by legacy_key so their ids (and user progress) are kept.
+        Returns (created, updated)
+        """
+        existing = {
+            instance.source_key: instance
+            for instance in model.objects.filter(source_key__in=source).only('source_key', *field_names)
+        }
+
+        # Adopt unkeyed rows that match a source row
+        unmatched = {
+            source_legacy_key(fields): source_key
+            for source_key, fields in source.items() if source_key not in existing
+        }
+        adopted = []
+        for instance in model.objects.filter(source_key__isnull=True, **(legacy_filter or {})).only('id', *field_names):
+            source_key = unmatched.pop(legacy_key(instance), None)
+            if source_key is not None:
+                instance.source_key = source_key
+                existing[source_key] = instance
+                adopted.append(instance)
+        model.objects.bulk_update(adopted, ['source_key'], batch_size=batch_size)
+
+        changed = [
+            model(source_key=source_key, **fields)
+            for source_key, fields in source.items()
+            if source_key not in existing
+            or any(getattr(existing[source_key], name) != value for name, value in fields.items())
+        ]
+        created = sum(1 for instance in changed if instance.source_key not in existing)
+
+        for start in range(0, len(changed), batch_size):
+            model.objects.bulk_create(
+                changed[start:start + batch_size],
+                update_conflicts=True,
+                unique_fields=['source_key'],
+                update_fields=[name.removesuffix('_id') for name in field_names] + ['updated_at'],
+            )
+            self.stdout.write(
+                f'\r  {model.__name__}: {min(start + batch_size, len(changed))}/{len(changed)} written',
+                ending=''
             )
-        )
\ No newline at end of file
+        if changed:
+            self.stdout.write('')
+        return created, len(changed) - created
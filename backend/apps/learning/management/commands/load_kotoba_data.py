@@ -2,109 +2,179 @@ import json
 import os
 from django.core.management.base import BaseCommand
 from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
 from apps.learning.models import (
     KotobaCategory, KotobaSubcategory, KotobaWord,
-    KotobaExample, KotobaVocabulary
+    KotobaExample, KotobaVocabulary, KotobaSubcategoryPayload
 )
+from apps.learning.kotoba_cache import bump_generation
+from apps.learning import search
+from apps.learning.sync import sync_write_window
 
 
 class Command(BaseCommand):
-    help = 'Load Kotoba data from JSON files into database'
+    help = 'Load Kotoba data from JSON files into database (diffed against existing rows)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Rows per bulk INSERT/UPDATE statement'
+        )
 
     def handle(self, *args, **options):
         data_dir = os.path.join(settings.BASE_DIR, 'data', 'ことば', 'New folder')
+        self.batch_size = options['batch_size']
+        self.report = []
+
+        self.stdout.write('Reading source files...')
+        categories_data = self.read_json(data_dir, 'ことば２.メインカテゴリー.json')
+        subcategories_data = self.read_json(data_dir, 'ことば3. サブカテゴリー.json')
+        words_data = self.read_json(data_dir, 'ことば4. 単語データ.json')
+        examples_data = self.read_json(data_dir, 'ことば5. 例文データ.json')
+        vocabulary_data = self.read_json(data_dir, 'ことば6. 語彙データ.json')
+
+        # Only rows whose primary key disappeared from the source are deleted, so
+        # UserWordProgress survives a reload for every word that still exists.
+        # The sync window keeps delta sync from handing out a cursor past rows this
+        # transaction stamps with self.now but has not committed yet
+        with sync_write_window(), transaction.atomic():
+            self.now = timezone.now()
+            categories = {
+                item['category_key']: {
+                    'japanese_name': item['japanese_name'],
+                    'indonesian_translation': item['indonesian_translation'],
+                    'ruby_reading': item['ruby_reading'],
+                    'order_number': int(item['order_number']),
+                }
+                for item in categories_data
+            }
+            delete_categories = self.sync(KotobaCategory, categories)
 
-        self.stdout.write(self.style.WARNING('Clearing existing Kotoba data...'))
-        # Clear existing data in reverse order of dependencies
-        KotobaVocabulary.objects.all().delete()
-        KotobaExample.objects.all().delete()
-        KotobaWord.objects.all().delete()
-        KotobaSubcategory.objects.all().delete()
-        KotobaCategory.objects.all().delete()
-
-        # Load categories
-        self.stdout.write('Loading categories...')
-        categories_file = os.path.join(data_dir, 'ことば２.メインカテゴリー.json')
-        with open(categories_file, 'r', encoding='utf-8') as f:
-            categories_data = json.load(f)
-            for item in categories_data:
-                KotobaCategory.objects.create(
-                    category_key=item['category_key'],
-                    japanese_name=item['japanese_name'],
-                    indonesian_translation=item['indonesian_translation'],
-                    ruby_reading=item['ruby_reading'],
-                    order_number=int(item['order_number'])
-                )
-        self.stdout.write(self.style.SUCCESS(f'Loaded {len(categories_data)} categories'))
-
-        # Load subcategories
-        self.stdout.write('Loading subcategories...')
-        subcategories_file = os.path.join(data_dir, 'ことば3. サブカテゴリー.json')
-        with open(subcategories_file, 'r', encoding='utf-8') as f:
-            subcategories_data = json.load(f)
+            # Subcategories have a surrogate id; match them on (category, subcategory key)
+            existing_subcategories = {
+                (sub.main_category_id, sub.subcategory_key): sub.pk
+                for sub in KotobaSubcategory.objects.only('id', 'main_category_id', 'subcategory_key')
+            }
+            subcategories, new_subcategories = {}, []
             for item in subcategories_data:
-                category = KotobaCategory.objects.get(category_key=item['main_category_key'])
-                KotobaSubcategory.objects.create(
-                    main_category=category,
-                    subcategory_key=item['subcategory_key'],
-                    japanese_name=item['japanese_name'],
-                    indonesian_translation=item['indonesian_translation'],
-                    ruby_reading=item['ruby_reading'],
-                    order_number=int(item['order_number'])
-                )
-        self.stdout.write(self.style.SUCCESS(f'Loaded {len(subcategories_data)} subcategories'))
-
-        # Load words
-        self.stdout.write('Loading words...')
-        words_file = os.path.join(data_dir, 'ことば4. 単語データ.json')
-        with open(words_file, 'r', encoding='utf-8') as f:
-            words_data = json.load(f)
-            for item in words_data:
-                category = KotobaCategory.objects.get(category_key=item['main_category_key'])
-                subcategory = KotobaSubcategory.objects.get(
-                    main_category=category,
-                    subcategory_key=item['subcategory_key']
-                )
-                KotobaWord.objects.create(
-                    word_id=item['word_id'],
-                    main_category=category,
-                    subcategory=subcategory,
-                    japanese_word=item['japanese_word'],
-                    ruby_reading=item['ruby_reading'],
-                    indonesian_translation=item['indonesian_translation']
-                )
-        self.stdout.write(self.style.SUCCESS(f'Loaded {len(words_data)} words'))
-
-        # Load examples
-        self.stdout.write('Loading examples...')
-        examples_file = os.path.join(data_dir, 'ことば5. 例文データ.json')
-        with open(examples_file, 'r', encoding='utf-8') as f:
-            examples_data = json.load(f)
-            for item in examples_data:
-                word = KotobaWord.objects.get(word_id=item['word_id'])
-                KotobaExample.objects.create(
-                    example_id=item['example_id'],
-                    word=word,
-                    japanese_example=item['japanese_example'],
-                    indonesian_example=item['indonesian_example'],
-                    order_number=int(item['order_number'])
-                )
-        self.stdout.write(self.style.SUCCESS(f'Loaded {len(examples_data)} examples'))
-
-        # Load vocabulary
-        self.stdout.write('Loading vocabulary...')
-        vocabulary_file = os.path.join(data_dir, 'ことば6. 語彙データ.json')
-        with open(vocabulary_file, 'r', encoding='utf-8') as f:
-            vocabulary_data = json.load(f)
-            for item in vocabulary_data:
-                example = KotobaExample.objects.get(example_id=item['example_id'])
-                KotobaVocabulary.objects.create(
-                    vocabulary_id=item['vocabulary_id'],
-                    example=example,
-                    japanese_word=item['japanese_word'],
-                    ruby_reading=item['ruby_reading'],
-                    indonesian_translation=item['indonesian_translation']
-                )
-        self.stdout.write(self.style.SUCCESS(f'Loaded {len(vocabulary_data)} vocabulary items'))
-
-        self.stdout.write(self.style.SUCCESS('Successfully loaded all Kotoba data!'))
\ No newline at end of file
+                natural_key = (item['main_category_key'], item['subcategory_key'])
+                fields = {
+                    'main_category_id': item['main_category_key'],
+                    'subcategory_key': item['subcategory_key'],
+                    'japanese_name': item['japanese_name'],
+                    'indonesian_translation': item['indonesian_translation'],
+                    'ruby_reading': item['ruby_reading'],
+                    'order_number': int(item['order_number']),
+                }
+                if natural_key in existing_subcategories:
+                    subcategories[existing_subcategories[natural_key]] = fields
+                else:
+                    new_subcategories.append(KotobaSubcategory(**fields))
+            delete_subcategories = self.sync(KotobaSubcategory, subcategories, extra_created=new_subcategories)
+
+            subcategory_ids = {
+                (sub.main_category_id, sub.subcategory_key): sub.pk
+                for sub in KotobaSubcategory.objects.only('id', 'main_category_id', 'subcategory_key')
+            }
+            words = {
+                item['word_id']: {
+                    'main_category_id': item['main_category_key'],
+                    'subcategory_id': subcategory_ids[(item['main_category_key'], item['subcategory_key'])],
+                    'japanese_word': item['japanese_word'],
+                    'ruby_reading': item['ruby_reading'],
+                    'indonesian_translation': item['indonesian_translation'],
+                }
+                for item in words_data
+            }
+            delete_words = self.sync(KotobaWord, words)
+
+            examples = {
+                item['example_id']: {
+                    'word_id': item['word_id'],
+                    'japanese_example': item['japanese_example'],
+                    'indonesian_example': item['indonesian_example'],
+                    'order_number': int(item['order_number']),
+                }
+                for item in examples_data
+            }
+            delete_examples = self.sync(KotobaExample, examples)
+
+            vocabulary = {
+                item['vocabulary_id']: {
+                    'example_id': item['example_id'],
+                    'japanese_word': item['japanese_word'],
+                    'ruby_reading': item['ruby_reading'],
+                    'indonesian_translation': item['indonesian_translation'],
+                }
+                for item in vocabulary_data
+            }
+            delete_vocabulary = self.sync(KotobaVocabulary, vocabulary)
+
+            # Delete children before parents
+            for model, pks in [
+                (KotobaVocabulary, delete_vocabulary),
+                (KotobaExample, delete_examples),
+                (KotobaWord, delete_words),
+                (KotobaSubcategory, delete_subcategories),
+                (KotobaCategory, delete_categories),
+            ]:
+                if pks:
+                    model.objects.filter(pk__in=pks).delete()
+
+            # Bulk writes skip the counter signals
+            KotobaCategory.recount_words()
+            KotobaSubcategory.recount_words()
+
+        for label, inserted, updated, deleted, unchanged in self.report:
+            self.stdout.write(
+                f'{label:<17} inserted {inserted:>6}  updated {updated:>6}  '
+                f'deleted {deleted:>6}  unchanged {unchanged:>6}'
+            )
+
+        # Bulk writes bypass the model signals: refresh derived data explicitly
+        bump_generation()
+        self.stdout.write('Building subcategory payloads...')
+        payloads = KotobaSubcategoryPayload.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Built {len(payloads)} subcategory payloads'))
+
+        self.stdout.write('Building search index...')
+        posting_count = search.rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f'Indexed {posting_count} search postings'))
+
+        self.stdout.write(self.style.SUCCESS('Successfully loaded all Kotoba data!'))
+
+    def read_json(self, data_dir, filename):
+        with open(os.path.join(data_dir, filename), 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def sync(self, model, source, extra_created=()):
+        """
+        Diff {pk: field values} against the table and bulk insert/update.
+        Returns the primary keys missing from the source (deleted by the caller, children first)
+        """
+        field_names = sorted({name for fields in source.values() for name in fields})
+        existing = model.objects.only(*field_names).in_bulk()
+
+        to_create, to_update, unchanged = list(extra_created), [], 0
+        for pk, fields in source.items():
+            instance = existing.get(pk)
+            if instance is None:
+                to_create.append(model(pk=pk, **fields))
+            elif any(getattr(instance, name) != value for name, value in fields.items()):
+                for name, value in fields.items():
+                    setattr(instance, name, value)
+                instance.updated_at = self.now
+                to_update.append(instance)
+            else:
+                unchanged += 1
+
+        model.objects.bulk_create(to_create, batch_size=self.batch_size)
+        if to_update:
+            model.objects.bulk_update(to_update, field_names + ['updated_at'], batch_size=self.batch_size)
+
+        stale = [pk for pk in existing if pk not in source]
+        self.report.append((model.__name__, len(to_create), len(to_update), len(stale), unchanged))
+        return stale
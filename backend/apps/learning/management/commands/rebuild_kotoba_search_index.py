@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+from apps.learning import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the Kotoba search index from the word, example and vocabulary tables'
+
+    def handle(self, *args, **options):
+        posting_count = search.rebuild_index()
+
+        self.stdout.write(self.style.SUCCESS(f'Indexed {posting_count} search postings'))
@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count
+from apps.learning.models import KotobaCategory, KotobaSubcategory, FlashcardDeck
+
+
+# (model, counter field, related name counted, recount method name)
+COUNTERS = [
+    (KotobaCategory, 'word_count', 'words', 'recount_words'),
+    (KotobaSubcategory, 'word_count', 'words', 'recount_words'),
+    (FlashcardDeck, 'card_count', 'cards', 'recount_cards'),
+]
+
+
+class Command(BaseCommand):
+    help = 'Check and recompute the denormalized word_count / card_count columns'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Only report mismatches (exits with an error if any are found)'
+        )
+
+    def handle(self, *args, **options):
+        total_mismatches = 0
+
+        with transaction.atomic():
+            for model, field, related_name, recount in COUNTERS:
+                mismatches = [
+                    (pk, stored, actual)
+                    for pk, stored, actual in model.objects.annotate(actual=Count(related_name))
+                    .values_list('pk', field, 'actual')
+                    if stored != actual
+                ]
+                total_mismatches += len(mismatches)
+                for pk, stored, actual in mismatches:
+                    self.stdout.write(self.style.WARNING(
+                        f'{model.__name__} {pk}: {field} is {stored}, expected {actual}'
+                    ))
+
+                if not options['check'] and mismatches:
+                    getattr(model, recount)([pk for pk, _, _ in mismatches])
+
+                self.stdout.write(f'{model.__name__}.{field}: {len(mismatches)} mismatched rows')
+
+        if options['check'] and total_mismatches:
+            raise CommandError(f'{total_mismatches} counters are out of date')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Counters checked ({total_mismatches} fixed)' if not options['check'] else 'All counters are up to date'
+        ))
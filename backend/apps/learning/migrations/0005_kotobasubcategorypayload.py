@@ -0,0 +1,28 @@
+# Generated by Django 4.2.7 on 2026-10-17 22:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('learning', '0004_flashcarddeck_flashcardcard_userflashcardprogress'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='KotobaSubcategoryPayload',
+            fields=[
+                ('subcategory', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='payload', serialize=False, to='learning.kotobasubcategory')),
+                ('category_key', models.CharField(max_length=100)),
+                ('subcategory_key', models.CharField(max_length=100)),
+                ('payload', models.JSONField(default=dict)),
+                ('built_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'kotoba_subcategory_payloads',
+                'unique_together': {('category_key', 'subcategory_key')},
+            },
+        ),
+    ]
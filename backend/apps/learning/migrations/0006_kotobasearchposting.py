@@ -0,0 +1,28 @@
+# Generated by Django 4.2.7 on 2026-10-17 22:43
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('learning', '0005_kotobasubcategorypayload'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='KotobaSearchPosting',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('gram', models.CharField(max_length=2)),
+                ('doc_type', models.CharField(choices=[('word', 'Word'), ('example', 'Example'), ('vocabulary', 'Vocabulary')], max_length=10)),
+                ('doc_id', models.CharField(max_length=50)),
+                ('word', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_postings', to='learning.kotobaword')),
+            ],
+            options={
+                'db_table': 'kotoba_search_postings',
+                'indexes': [models.Index(fields=['gram', 'word', 'doc_type'], name='kotoba_sear_gram_91e939_idx'), models.Index(fields=['doc_type', 'doc_id'], name='kotoba_sear_doc_typ_44d80f_idx')],
+            },
+        ),
+    ]
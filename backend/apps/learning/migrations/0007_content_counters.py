@@ -0,0 +1,46 @@
+# Generated by Django 4.2.7 on 2026-10-17 22:46
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_counters(apps, schema_editor):
+    """Fill the counters for existing rows with one UPDATE per table"""
+    def count_of(model, fk_name):
+        return Coalesce(Subquery(
+            model.objects.filter(**{fk_name: OuterRef('pk')}).order_by()
+            .values(fk_name).annotate(total=Count('pk')).values('total')
+        ), 0)
+
+    KotobaWord = apps.get_model('learning', 'KotobaWord')
+    FlashcardCard = apps.get_model('learning', 'FlashcardCard')
+    apps.get_model('learning', 'KotobaCategory').objects.update(word_count=count_of(KotobaWord, 'main_category'))
+    apps.get_model('learning', 'KotobaSubcategory').objects.update(word_count=count_of(KotobaWord, 'subcategory'))
+    apps.get_model('learning', 'FlashcardDeck').objects.update(card_count=count_of(FlashcardCard, 'deck'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('learning', '0006_kotobasearchposting'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='flashcarddeck',
+            name='card_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='kotobacategory',
+            name='word_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='kotobasubcategory',
+            name='word_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 4.2.7 on 2026-10-17 22:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('learning', '0007_content_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyncTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model_label', models.CharField(max_length=50)),
+                ('object_id', models.CharField(max_length=50)),
+                ('deleted_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'sync_tombstones',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='flashcardcard',
+            index=models.Index(fields=['updated_at', 'id'], name='flashcard_c_updated_002256_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='flashcarddeck',
+            index=models.Index(fields=['updated_at', 'id'], name='flashcard_d_updated_8c75b8_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='kotobaexample',
+            index=models.Index(fields=['updated_at', 'example_id'], name='kotoba_exam_updated_88716d_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='kotobavocabulary',
+            index=models.Index(fields=['updated_at', 'vocabulary_id'], name='kotoba_voca_updated_689e9b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='kotobaword',
+            index=models.Index(fields=['updated_at', 'word_id'], name='kotoba_word_updated_bdf483_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='synctombstone',
+            index=models.Index(fields=['deleted_at', 'id'], name='sync_tombst_deleted_88c5b6_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-17 22:51
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('learning', '0008_sync_indexes_and_tombstones'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FlashcardReviewReceipt',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_id', models.CharField(max_length=64)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='flashcard_review_receipts', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'flashcard_review_receipts',
+                'unique_together': {('user', 'event_id')},
+            },
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 4.2.7 on 2026-10-17 22:53
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('learning', '0009_flashcard_review_receipts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SchedulerParameters',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ease_multiplier', models.FloatField(default=1.0)),
+                ('interval_multiplier', models.FloatField(default=1.0)),
+                ('review_count', models.IntegerField(default=0)),
+                ('fitted_at', models.DateTimeField(auto_now=True)),
+                ('deck', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='scheduler_parameters', to='learning.flashcarddeck')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='scheduler_parameters', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'flashcard_scheduler_parameters',
+            },
+        ),
+        migrations.CreateModel(
+            name='FlashcardReviewLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('grade', models.PositiveSmallIntegerField(choices=[(1, 'Again'), (2, 'Hard'), (3, 'Good'), (4, 'Easy')])),
+                ('repetitions', models.PositiveSmallIntegerField()),
+                ('interval_days', models.PositiveSmallIntegerField()),
+                ('elapsed_days', models.PositiveSmallIntegerField()),
+                ('reviewed_at', models.DateTimeField()),
+                ('card', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='learning.flashcardcard')),
+                ('deck', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='learning.flashcarddeck')),
+                ('user', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'flashcard_review_log',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='schedulerparameters',
+            constraint=models.UniqueConstraint(condition=models.Q(('deck__isnull', True)), fields=('user',), name='scheduler_parameters_unique_user'),
+        ),
+        migrations.AddConstraint(
+            model_name='schedulerparameters',
+            constraint=models.UniqueConstraint(condition=models.Q(('user__isnull', True)), fields=('deck',), name='scheduler_parameters_unique_deck'),
+        ),
+        migrations.AddConstraint(
+            model_name='schedulerparameters',
+            constraint=models.UniqueConstraint(condition=models.Q(('deck__isnull', False), ('user__isnull', False)), fields=('user', 'deck'), name='scheduler_parameters_unique_user_deck'),
+        ),
+    ]
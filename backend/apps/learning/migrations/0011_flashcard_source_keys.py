@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-17 22:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('learning', '0010_review_log_and_scheduler_parameters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='flashcardcard',
+            name='source_key',
+            field=models.CharField(blank=True, max_length=50, null=True, unique=True),
+        ),
+        migrations.AddField(
+            model_name='flashcarddeck',
+            name='source_key',
+            field=models.CharField(blank=True, max_length=100, null=True, unique=True),
+        ),
+    ]
@@ -1,5 +1,8 @@
-from django.db import models
-from django.core.cache import cache
+from django.db import models, transaction
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from .kotoba_cache import cached_fill, bump_generation
+from .records import RECORD_VERSION, WORD_FORMAT, encode_category, decode_category, encode_word, decode_word
 from apps.users.models import User
 
 class SubjectGroup(models.Model):
@@ -254,6 +257,17 @@ class UserProgress(models.Model):
         db_table = 'learning_user_progress'
         unique_together = ['user', 'subject', 'item', 'chapter', 'page', 'text']
 
+def _count_subquery(model, fk_name):
+    """Correlated COUNT(*) of model rows pointing at the outer row through fk_name (0 when none)"""
+    counts = (
+        model.objects.filter(**{fk_name: OuterRef('pk')})
+        .order_by()
+        .values(fk_name)
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    return Coalesce(Subquery(counts), 0)
+
 # Kotoba (Vocabulary) Models
 class KotobaCategory(models.Model):
     """Main category for Kotoba (e.g., 介護の勉強, 仕事)"""
@@ -262,6 +276,7 @@ class KotobaCategory(models.Model):
     indonesian_translation = models.CharField(max_length=200)
     ruby_reading = models.CharField(max_length=200)
     order_number = models.IntegerField(default=0)
+    word_count = models.IntegerField(default=0)  # Maintained by signals and loaders (recount_content_counters)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -274,13 +289,18 @@ class KotobaCategory(models.Model):
 
     @classmethod
     def get_cached(cls, category_key):
-        """Get category with caching"""
-        cache_key = f'kotoba_category_{category_key}'
-        category = cache.get(cache_key)
-        if not category:
-            category = cls.objects.get(category_key=category_key)
-            cache.set(cache_key, category, timeout=3600)  # Cache for 1 hour
-        return category
+        """Get a read-only CategoryRecord with caching (invalidated by the Kotoba content generation)"""
+        data = cached_fill(
+            f'kotoba_category_v{RECORD_VERSION}_{category_key}',
+            lambda: encode_category(cls.objects.get(category_key=category_key))
+        )
+        return decode_category(data)
+
+    @classmethod
+    def recount_words(cls, pks=None):
+        """Recompute word_count with one UPDATE (all rows when pks is None)"""
+        queryset = cls.objects.all() if pks is None else cls.objects.filter(pk__in=pks)
+        return queryset.update(word_count=_count_subquery(KotobaWord, 'main_category'))
 
 class KotobaSubcategory(models.Model):
     """Subcategory for Kotoba (e.g., 介護の基本, 移動・移乗の介護)"""
@@ -290,6 +310,7 @@ class KotobaSubcategory(models.Model):
     indonesian_translation = models.CharField(max_length=200)
     ruby_reading = models.CharField(max_length=200)
     order_number = models.IntegerField(default=0)
+    word_count = models.IntegerField(default=0)  # Maintained by signals and loaders (recount_content_counters)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -301,6 +322,12 @@ class KotobaSubcategory(models.Model):
     def __str__(self):
         return f"{self.main_category.japanese_name} - {self.japanese_name}"
 
+    @classmethod
+    def recount_words(cls, pks=None):
+        """Recompute word_count with one UPDATE (all rows when pks is None)"""
+        queryset = cls.objects.all() if pks is None else cls.objects.filter(pk__in=pks)
+        return queryset.update(word_count=_count_subquery(KotobaWord, 'subcategory'))
+
 class KotobaWord(models.Model):
     """Individual word in Kotoba"""
     word_id = models.CharField(max_length=50, unique=True, primary_key=True)
@@ -315,19 +342,21 @@ class KotobaWord(models.Model):
     class Meta:
         db_table = 'kotoba_words'
         ordering = ['japanese_word']
+        indexes = [
+            models.Index(fields=['updated_at', 'word_id']),
+        ]
 
     def __str__(self):
         return self.japanese_word
 
     @classmethod
     def get_cached(cls, word_id):
-        """Get word with caching"""
-        cache_key = f'kotoba_word_{word_id}'
-        word = cache.get(cache_key)
-        if not word:
-            word = cls.objects.prefetch_related('examples__vocabulary').get(word_id=word_id)
-            cache.set(cache_key, word, timeout=3600)  # Cache for 1 hour
-        return word
+        """Get a read-only WordRecord (with examples and vocabulary) with caching (invalidated by the Kotoba content generation)"""
+        data = cached_fill(
+            f'kotoba_word_v{WORD_FORMAT}_{word_id}',
+            lambda: encode_word(cls.objects.prefetch_related('examples__vocabulary').get(word_id=word_id))
+        )
+        return decode_word(data)
 
 class KotobaExample(models.Model):
     """Example sentence for a word"""
@@ -342,6 +371,9 @@ class KotobaExample(models.Model):
     class Meta:
         db_table = 'kotoba_examples'
         ordering = ['order_number']
+        indexes = [
+            models.Index(fields=['updated_at', 'example_id']),
+        ]
 
     def __str__(self):
         return f"{self.word.japanese_word} - Example {self.order_number}"
@@ -359,10 +391,140 @@ class KotobaVocabulary(models.Model):
     class Meta:
         db_table = 'kotoba_vocabulary'
         ordering = ['japanese_word']
+        indexes = [
+            models.Index(fields=['updated_at', 'vocabulary_id']),
+        ]
 
     def __str__(self):
         return self.japanese_word
 
+class KotobaSubcategoryPayload(models.Model):
+    """Prebuilt word/example/vocabulary document for one subcategory page"""
+    subcategory = models.OneToOneField(KotobaSubcategory, on_delete=models.CASCADE, primary_key=True, related_name='payload')
+    category_key = models.CharField(max_length=100)
+    subcategory_key = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict)
+    built_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'kotoba_subcategory_payloads'
+        unique_together = ['category_key', 'subcategory_key']
+
+    def __str__(self):
+        return f"{self.category_key}/{self.subcategory_key}"
+
+    @classmethod
+    def get_payload(cls, category_key, subcategory_key):
+        """
+        Get the page payload with one keyed read (cache, then payload table).
+        A missing row is built on demand; raises KotobaSubcategory.DoesNotExist
+        """
+        def load():
+            row = cls.objects.filter(category_key=category_key, subcategory_key=subcategory_key).first()
+            if row is None:
+                subcategory = KotobaSubcategory.objects.get(
+                    main_category_id=category_key, subcategory_key=subcategory_key
+                )
+                # Filling a gap changes no content, so cached copies stay valid
+                row = cls.rebuild([subcategory.pk], bump=False)[0]
+            return row.payload
+
+        return cached_fill(f'kotoba_payload_{category_key}_{subcategory_key}', load)
+
+    @classmethod
+    def rebuild(cls, subcategory_ids=None, bump=True):
+        """
+        Regenerate payloads for the given subcategories (all when None).
+        With bump (write paths and loaders) cached copies are invalidated as well
+        """
+        subcategories = KotobaSubcategory.objects.select_related('main_category').prefetch_related(
+            'words__examples__vocabulary'
+        )
+        if subcategory_ids is not None:
+            subcategories = subcategories.filter(pk__in=subcategory_ids)
+
+        rows = [
+            cls(
+                subcategory=subcategory,
+                category_key=subcategory.main_category_id,
+                subcategory_key=subcategory.subcategory_key,
+                payload=cls.build_payload(subcategory),
+            )
+            for subcategory in subcategories
+        ]
+
+        with transaction.atomic():
+            stale = cls.objects.all() if subcategory_ids is None else cls.objects.filter(subcategory_id__in=subcategory_ids)
+            stale.delete()
+            cls.objects.bulk_create(rows)
+
+        # Rebuilt rows must not be shadowed by payloads cached under the current generation
+        if bump:
+            bump_generation()
+        return rows
+
+    @staticmethod
+    def build_payload(subcategory):
+        """Serialize a subcategory (with prefetched words__examples__vocabulary) for the template"""
+        category = subcategory.main_category
+        return {
+            'category': {
+                'key': category.category_key,
+                'japanese': category.japanese_name,
+                'indonesian': category.indonesian_translation,
+                'ruby': category.ruby_reading
+            },
+            'subcategory': {
+                'key': subcategory.subcategory_key,
+                'japanese': subcategory.japanese_name,
+                'indonesian': subcategory.indonesian_translation,
+                'ruby': subcategory.ruby_reading
+            },
+            'words': [{
+                'id': word.word_id,
+                'japanese': word.japanese_word,
+                'ruby': word.ruby_reading,
+                'indonesian': word.indonesian_translation,
+                'examples': [{
+                    'id': example.example_id,
+                    'japanese': example.japanese_example,
+                    'indonesian': example.indonesian_example,
+                    'order': example.order_number,
+                    'vocabulary': [{
+                        'japanese': vocab.japanese_word,
+                        'ruby': vocab.ruby_reading,
+                        'indonesian': vocab.indonesian_translation
+                    } for vocab in example.vocabulary.all()]
+                } for example in word.examples.all()]
+            } for word in subcategory.words.all()]
+        }
+
+class KotobaSearchPosting(models.Model):
+    """Inverted-index entry: a normalized character bigram found in a Kotoba document (see apps.learning.search)"""
+    DOC_WORD = 'word'
+    DOC_EXAMPLE = 'example'
+    DOC_VOCABULARY = 'vocabulary'
+    DOC_TYPES = [
+        (DOC_WORD, 'Word'),
+        (DOC_EXAMPLE, 'Example'),
+        (DOC_VOCABULARY, 'Vocabulary'),
+    ]
+
+    gram = models.CharField(max_length=2)
+    doc_type = models.CharField(max_length=10, choices=DOC_TYPES)
+    doc_id = models.CharField(max_length=50)
+    word = models.ForeignKey(KotobaWord, on_delete=models.CASCADE, related_name='search_postings')
+
+    class Meta:
+        db_table = 'kotoba_search_postings'
+        indexes = [
+            models.Index(fields=['gram', 'word', 'doc_type']),
+            models.Index(fields=['doc_type', 'doc_id']),
+        ]
+
+    def __str__(self):
+        return f"{self.gram} -> {self.doc_type}:{self.doc_id}"
+
 class UserWordProgress(models.Model):
     """Track user progress for Kotoba words"""
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='word_progress')
@@ -397,16 +559,27 @@ class FlashcardDeck(models.Model):
     is_premium = models.BooleanField(default=False)
     is_active = models.BooleanField(default=True)
     order = models.IntegerField(default=0)
+    card_count = models.IntegerField(default=0)  # Maintained by signals and loaders (recount_content_counters)
+    source_key = models.CharField(max_length=100, unique=True, null=True, blank=True)  # KotobaCategory key for loaded decks
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         db_table = 'flashcard_decks'
         ordering = ['order', 'name']
+        indexes = [
+            models.Index(fields=['updated_at', 'id']),
+        ]
 
     def __str__(self):
         return self.name
 
+    @classmethod
+    def recount_cards(cls, pks=None):
+        """Recompute card_count with one UPDATE (all rows when pks is None)"""
+        queryset = cls.objects.all() if pks is None else cls.objects.filter(pk__in=pks)
+        return queryset.update(card_count=_count_subquery(FlashcardCard, 'deck'))
+
 class FlashcardCard(models.Model):
     """Individual flashcard with front/back content"""
     deck = models.ForeignKey(FlashcardDeck, on_delete=models.CASCADE, related_name='cards')
@@ -417,12 +590,16 @@ class FlashcardCard(models.Model):
     example_translation = models.TextField(blank=True)
     notes = models.TextField(blank=True)
     order = models.IntegerField(default=0)
+    source_key = models.CharField(max_length=50, unique=True, null=True, blank=True)  # KotobaWord.word_id for loaded cards
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         db_table = 'flashcard_cards'
         ordering = ['order', 'id']
+        indexes = [
+            models.Index(fields=['updated_at', 'id']),
+        ]
 
     def __str__(self):
         return f"{self.deck.name} - {self.front_text[:30]}"
@@ -466,4 +643,93 @@ class UserFlashcardProgress(models.Model):
         """Calculate accuracy percentage"""
         if self.total_reviews == 0:
             return 0
-        return (self.correct_reviews / self.total_reviews) * 100
\ No newline at end of file
+        return (self.correct_reviews / self.total_reviews) * 100
+
+class FlashcardReviewReceipt(models.Model):
+    """Client event id of a review already applied, so replayed offline batches are ignored"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='flashcard_review_receipts')
+    event_id = models.CharField(max_length=64)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'flashcard_review_receipts'
+        unique_together = ['user', 'event_id']
+
+    def __str__(self):
+        return f"{self.user_id} - {self.event_id}"
+
+class FlashcardReviewLog(models.Model):
+    """
+    Append-only history of flashcard reviews, inserted in batches and read by
+    fit_scheduler_parameters. Kept narrow (small ints, no secondary indexes) since
+    it grows by one row per review; deck is copied from the card so fitting needs no join.
+    The foreign keys are unindexed, so they are left unconstrained and not cascaded
+    (a cascade would scan the whole log on every user, card or deck delete); rows of
+    deleted users and cards stay in the history.
+    """
+    user = models.ForeignKey(
+        User, on_delete=models.DO_NOTHING, db_constraint=False, db_index=False, related_name='+'
+    )
+    card = models.ForeignKey(
+        FlashcardCard, on_delete=models.DO_NOTHING, db_constraint=False, db_index=False, related_name='+'
+    )
+    deck = models.ForeignKey(
+        FlashcardDeck, on_delete=models.DO_NOTHING, db_constraint=False, db_index=False, related_name='+'
+    )
+    grade = models.PositiveSmallIntegerField(choices=UserFlashcardProgress.DIFFICULTY_CHOICES)
+    repetitions = models.PositiveSmallIntegerField()  # Successful reviews in a row before this one
+    interval_days = models.PositiveSmallIntegerField()  # Interval that was scheduled before this review
+    elapsed_days = models.PositiveSmallIntegerField()  # Days actually elapsed since the previous review
+    reviewed_at = models.DateTimeField()
+
+    class Meta:
+        db_table = 'flashcard_review_log'
+
+class SchedulerParameters(models.Model):
+    """
+    Fitted SM-2 multipliers for one user (deck empty) or one deck (user empty).
+    User parameters take precedence over deck parameters; see apps.learning.scheduler.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='scheduler_parameters')
+    deck = models.ForeignKey(FlashcardDeck, on_delete=models.CASCADE, null=True, blank=True, related_name='scheduler_parameters')
+    ease_multiplier = models.FloatField(default=1.0)  # Scales the ease factor when intervals grow
+    interval_multiplier = models.FloatField(default=1.0)  # Scales every new interval
+    review_count = models.IntegerField(default=0)  # Reviews the fit was based on
+    fitted_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'flashcard_scheduler_parameters'
+        # NULLs are distinct in a plain unique (user, deck), so each scope needs its own partial constraint
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user'], condition=models.Q(deck__isnull=True),
+                name='scheduler_parameters_unique_user'
+            ),
+            models.UniqueConstraint(
+                fields=['deck'], condition=models.Q(user__isnull=True),
+                name='scheduler_parameters_unique_deck'
+            ),
+            models.UniqueConstraint(
+                fields=['user', 'deck'], condition=models.Q(user__isnull=False, deck__isnull=False),
+                name='scheduler_parameters_unique_user_deck'
+            ),
+        ]
+
+    def __str__(self):
+        scope = f"user {self.user_id}" if self.user_id else f"deck {self.deck_id}"
+        return f"{scope}: ease x{self.ease_multiplier:.2f}, interval x{self.interval_multiplier:.2f}"
+
+class SyncTombstone(models.Model):
+    """Deleted Kotoba/flashcard row, reported to clients by the delta sync API (see apps.learning.sync)"""
+    model_label = models.CharField(max_length=50)
+    object_id = models.CharField(max_length=50)
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'sync_tombstones'
+        indexes = [
+            models.Index(fields=['deleted_at', 'id']),
+        ]
+
+    def __str__(self):
+        return f"{self.model_label}:{self.object_id} deleted {self.deleted_at}"
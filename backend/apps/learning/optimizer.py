@@ -0,0 +1,71 @@
+"""
+Offline fit of the SM-2 multipliers in SchedulerParameters
+
+Each logged review gives the interval that was scheduled, the days that
+actually elapsed and whether the card was recalled (grade > Again). Recall is
+modelled as RETENTION ** (elapsed / (scheduled * m)): m > 1 means memories
+last longer than scheduled, so intervals can be stretched by m. Reviews are
+binned by elapsed/scheduled per group with np.bincount, and the log-likelihood
+of every candidate m is evaluated for all groups at once, so the cost is one
+pass over the arrays however many groups there are.
+"""
+import numpy as np
+
+RETENTION = 0.9  # Recall probability SM-2 intervals are meant to hit
+MULTIPLIER_GRID = np.exp(np.linspace(np.log(0.25), np.log(4.0), 121))
+RATIO_BIN_EDGES = np.exp(np.linspace(np.log(1 / 16), np.log(16), 65))
+MIN_MULTIPLIER, MAX_MULTIPLIER = 0.5, 2.5  # Clamp for the stored multipliers
+YOUNG_REPETITIONS = 2  # Reviews before this many successes use interval_multiplier
+
+
+def _bin_centers():
+    centers = np.sqrt(RATIO_BIN_EDGES[:-1] * RATIO_BIN_EDGES[1:])
+    # Ratios outside the edges fall in the two extra end bins
+    return np.concatenate([[RATIO_BIN_EDGES[0]], centers, [RATIO_BIN_EDGES[-1]]])
+
+
+def fit_stability(groups, group_count, ratio, recalled):
+    """
+    Maximum likelihood m per group. Returns (m, review counts), both of length group_count
+    (m is 1.0 for groups without reviews).
+    """
+    centers = _bin_centers()
+    bins = np.searchsorted(RATIO_BIN_EDGES, ratio)
+    flat = groups.astype(np.int64) * len(centers) + bins
+    size = group_count * len(centers)
+    totals = np.bincount(flat, minlength=size).reshape(group_count, len(centers)).astype(np.float64)
+    successes = np.bincount(flat, weights=recalled, minlength=size).reshape(group_count, len(centers))
+
+    # log P(recall) for every (candidate m, ratio bin)
+    log_recall = np.log(RETENTION) * centers[np.newaxis, :] / MULTIPLIER_GRID[:, np.newaxis]
+    log_forget = np.log(-np.expm1(log_recall))
+    likelihood = successes @ log_recall.T + (totals - successes) @ log_forget.T
+
+    counts = totals.sum(axis=1).astype(np.int64)
+    stability = np.where(counts > 0, MULTIPLIER_GRID[np.argmax(likelihood, axis=1)], 1.0)
+    return stability, counts
+
+
+def fit_multipliers(groups, group_count, grade, repetitions, interval_days, elapsed_days, current, min_reviews):
+    """
+    New (ease_multiplier, interval_multiplier) per group from the review arrays.
+    current: (group_count, 2) array of the multipliers in effect while the log was written.
+    Groups with fewer than min_reviews young or mature reviews keep that multiplier.
+    Returns (multipliers array (group_count, 2), review counts)
+    """
+    scheduled = interval_days > 0  # First sight of a card has no schedule to judge
+    ratio = elapsed_days[scheduled] / interval_days[scheduled]
+    recalled = (grade[scheduled] > 1).astype(np.float64)
+    young = repetitions[scheduled] < YOUNG_REPETITIONS
+    groups = groups[scheduled]
+
+    young_m, young_counts = fit_stability(groups[young], group_count, ratio[young], recalled[young])
+    mature_m, mature_counts = fit_stability(groups[~young], group_count, ratio[~young], recalled[~young])
+
+    result = current.astype(np.float64)
+    # Mature intervals already carry the young correction through the interval they grow from
+    fit_young = young_counts >= min_reviews
+    fit_mature = mature_counts >= min_reviews
+    result[fit_mature, 0] *= mature_m[fit_mature] / np.where(fit_young, young_m, 1.0)[fit_mature]
+    result[fit_young, 1] *= young_m[fit_young]
+    return np.clip(result, MIN_MULTIPLIER, MAX_MULTIPLIER), young_counts + mature_counts
@@ -0,0 +1,107 @@
+"""
+Compact cache form for Kotoba objects
+
+The caches store plain tuples (field values in a fixed order) instead of
+pickled model instances; large word entries are msgpack-packed and
+zlib-compressed when msgpack is installed. Readers get read-only __slots__
+records. Bump RECORD_VERSION whenever a tuple layout changes: it is part of
+the cache key, so old entries are simply never read again. Word keys use
+WORD_FORMAT, which also records whether msgpack is installed, so a worker
+without it never reads packed bytes written by one that has it.
+"""
+import zlib
+
+try:
+    import msgpack
+except ImportError:  # Optional: entries stay plain tuples without it
+    msgpack = None
+
+RECORD_VERSION = 1
+WORD_FORMAT = f'{RECORD_VERSION}m' if msgpack is not None else str(RECORD_VERSION)
+COMPRESS_THRESHOLD = 2048  # Packed bytes above which a word entry is compressed
+
+
+class Record:
+    """Immutable attribute bag built from a cached tuple"""
+    __slots__ = ()
+
+    def __init__(self, *values):
+        for name, value in zip(self.__slots__, values):
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f'{type(self).__name__} is read-only')
+
+    def __repr__(self):
+        return f'<{type(self).__name__} {getattr(self, self.__slots__[0])}>'
+
+
+class CategoryRecord(Record):
+    __slots__ = ('category_key', 'japanese_name', 'indonesian_translation', 'ruby_reading', 'order_number', 'word_count')
+
+    @property
+    def pk(self):
+        return self.category_key
+
+
+class VocabularyRecord(Record):
+    __slots__ = ('vocabulary_id', 'japanese_word', 'ruby_reading', 'indonesian_translation')
+
+
+class ExampleRecord(Record):
+    __slots__ = ('example_id', 'japanese_example', 'indonesian_example', 'order_number', 'vocabulary')
+
+
+class WordRecord(Record):
+    __slots__ = (
+        'word_id', 'main_category_id', 'subcategory_id', 'japanese_word', 'ruby_reading',
+        'indonesian_translation', 'examples'
+    )
+
+    @property
+    def pk(self):
+        return self.word_id
+
+
+def encode_category(category):
+    return (
+        category.category_key, category.japanese_name, category.indonesian_translation,
+        category.ruby_reading, category.order_number, category.word_count,
+    )
+
+
+def decode_category(data):
+    return CategoryRecord(*data)
+
+
+def encode_word(word):
+    """Word with prefetched examples__vocabulary as nested tuples (packed and compressed when large)"""
+    data = (
+        word.word_id, word.main_category_id, word.subcategory_id, word.japanese_word,
+        word.ruby_reading, word.indonesian_translation,
+        tuple(
+            (
+                example.example_id, example.japanese_example, example.indonesian_example, example.order_number,
+                tuple(
+                    (vocab.vocabulary_id, vocab.japanese_word, vocab.ruby_reading, vocab.indonesian_translation)
+                    for vocab in example.vocabulary.all()
+                ),
+            )
+            for example in word.examples.all()
+        ),
+    )
+    if msgpack is not None:
+        packed = msgpack.packb(data)
+        if len(packed) > COMPRESS_THRESHOLD:
+            return zlib.compress(packed)
+    return data
+
+
+def decode_word(data):
+    if isinstance(data, bytes):
+        data = msgpack.unpackb(zlib.decompress(data))
+    *fields, examples = data
+    return WordRecord(*fields, tuple(
+        ExampleRecord(*example_fields, tuple(VocabularyRecord(*vocab) for vocab in vocabulary))
+        for *example_fields, vocabulary in examples
+    ))
@@ -0,0 +1,321 @@
+"""
+SM-2 spaced repetition for flashcards
+
+Grades are the UserFlashcardProgress.DIFFICULTY_CHOICES buttons
+(1 Again, 2 Hard, 3 Good, 4 Easy), mapped onto SM-2 response qualities
+2..5: Again is a lapse, the other three pass and move the ease factor by
+the SM-2 formula.
+
+Intervals can be tuned per user or per deck with the multipliers in
+SchedulerParameters, fitted offline from FlashcardReviewLog by the
+fit_scheduler_parameters command: interval_multiplier scales the first two
+intervals, ease_multiplier scales the ease factor used to grow later ones.
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, Exists, OuterRef, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import (
+    FlashcardCard, UserFlashcardProgress, FlashcardReviewReceipt, FlashcardReviewLog, SchedulerParameters
+)
+
+AGAIN, HARD, GOOD, EASY = 1, 2, 3, 4
+GRADES = (AGAIN, HARD, GOOD, EASY)
+
+MIN_EASE = 1.3
+FIRST_INTERVAL = 1
+SECOND_INTERVAL = 6
+EASY_BONUS = 1.3  # Extra interval growth for Easy
+MASTERED_INTERVAL = 21  # Cards scheduled this far out count as mastered
+DEFAULT_QUEUE_SIZE = 20
+MAX_QUEUE_SIZE = 200
+STUDY_WINDOW = 50  # Cards per window streamed to the study page
+STUDY_CARD_FIELDS = [
+    'id', 'order', 'front_text', 'front_reading', 'back_text', 'example_sentence', 'example_translation', 'notes',
+]
+MAX_BATCH_SIZE = 500  # Review events accepted per batch submission
+DEFAULT_PARAMETERS = (1.0, 1.0)  # (ease_multiplier, interval_multiplier)
+LOG_FIELD_MAX = 32767  # PositiveSmallIntegerField columns of FlashcardReviewLog
+
+PROGRESS_FIELDS = [
+    'ease_factor', 'interval_days', 'repetitions', 'last_difficulty', 'next_review_date',
+    'is_mastered', 'total_reviews', 'correct_reviews', 'last_reviewed', 'updated_at',
+]
+
+
+def parse_grade(value):
+    """int grade from request data; ValueError if it is not 1-4"""
+    grade = int(value)
+    if grade not in GRADES:
+        raise ValueError(f'grade must be one of {GRADES}')
+    return grade
+
+
+def sm2(ease_factor, interval_days, repetitions, grade, parameters=DEFAULT_PARAMETERS):
+    """(ease_factor, interval_days, repetitions) after one review"""
+    ease_multiplier, interval_multiplier = parameters
+    quality = grade + 1
+    ease_factor = max(MIN_EASE, ease_factor + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+
+    if grade == AGAIN:
+        return ease_factor, FIRST_INTERVAL, 0
+
+    if repetitions == 0:
+        interval_days = round(FIRST_INTERVAL * interval_multiplier)
+    elif repetitions == 1:
+        interval_days = round(SECOND_INTERVAL * interval_multiplier)
+    else:
+        interval_days = round(interval_days * ease_factor * ease_multiplier)
+    if grade == EASY:
+        interval_days = round(interval_days * EASY_BONUS)
+    return ease_factor, max(FIRST_INTERVAL, interval_days), repetitions + 1
+
+
+def get_parameters(user, deck_ids):
+    """{deck_id: (ease_multiplier, interval_multiplier)}; the user's own fit wins over the deck's"""
+    rows = SchedulerParameters.objects.filter(
+        Q(user=user, deck__isnull=True) | Q(user__isnull=True, deck_id__in=deck_ids)
+    ).values_list('deck_id', 'ease_multiplier', 'interval_multiplier')
+    user_parameters, deck_parameters = None, {}
+    for deck_id, ease_multiplier, interval_multiplier in rows:
+        if deck_id is None:
+            user_parameters = (ease_multiplier, interval_multiplier)
+        else:
+            deck_parameters[deck_id] = (ease_multiplier, interval_multiplier)
+    return {
+        deck_id: user_parameters or deck_parameters.get(deck_id, DEFAULT_PARAMETERS)
+        for deck_id in deck_ids
+    }
+
+
+def log_entry(progress, deck_id, grade, reviewed_at):
+    """FlashcardReviewLog row for a review about to be applied to progress (not saved)"""
+    elapsed_days = (reviewed_at - progress.last_reviewed).days if progress.last_reviewed else 0
+    return FlashcardReviewLog(
+        user_id=progress.user_id,
+        card_id=progress.card_id,
+        deck_id=deck_id,
+        grade=grade,
+        repetitions=min(progress.repetitions, LOG_FIELD_MAX),
+        interval_days=min(progress.interval_days, LOG_FIELD_MAX),
+        elapsed_days=min(max(elapsed_days, 0), LOG_FIELD_MAX),
+        reviewed_at=reviewed_at,
+    )
+
+
+def review(progress, grade, reviewed_at=None, parameters=DEFAULT_PARAMETERS):
+    """Apply one graded review to a UserFlashcardProgress (not saved)"""
+    reviewed_at = reviewed_at or timezone.now()
+    progress.ease_factor, progress.interval_days, progress.repetitions = sm2(
+        progress.ease_factor, progress.interval_days, progress.repetitions, grade, parameters
+    )
+    progress.last_difficulty = grade
+    progress.next_review_date = timezone.localdate(reviewed_at) + timedelta(days=progress.interval_days)
+    progress.is_mastered = progress.interval_days >= MASTERED_INTERVAL
+    progress.total_reviews += 1
+    if grade != AGAIN:
+        progress.correct_reviews += 1
+    progress.last_reviewed = reviewed_at
+    return progress
+
+
+def parse_review_events(items):
+    """
+    Validate submitted review events ({'event_id', 'card_id', 'grade', 'reviewed_at'}).
+    Returns (events as (event_id, card_id, grade, reviewed_at), rejected as {'event_id', 'error'})
+    """
+    now = timezone.now()
+    events, rejected, seen = [], [], set()
+    for item in items:
+        event_id = str(item.get('event_id', '')) if isinstance(item, dict) else ''
+        if not event_id or len(event_id) > 64:
+            rejected.append({'event_id': event_id, 'error': 'event_id must be 1-64 characters'})
+            continue
+        if event_id in seen:
+            continue
+        try:
+            card_id = int(item.get('card_id'))
+            grade = parse_grade(item.get('grade'))
+            reviewed_at = parse_datetime(str(item.get('reviewed_at', '')))
+            if reviewed_at is None:
+                raise ValueError('reviewed_at must be an ISO 8601 datetime')
+        except (TypeError, ValueError) as e:
+            rejected.append({'event_id': event_id, 'error': str(e)})
+            continue
+        if timezone.is_naive(reviewed_at):
+            reviewed_at = timezone.make_aware(reviewed_at)
+        seen.add(event_id)
+        events.append((event_id, card_id, grade, min(reviewed_at, now)))
+    return events, rejected
+
+
+def apply_review_batch(user, events):
+    """
+    Replay review events (from parse_review_events) through SM-2 in memory, in
+    reviewed_at order, and persist them with one bulk_create and one bulk_update
+    on UserFlashcardProgress, plus one insert into the review log. Event ids
+    already received are skipped, so a client can resend a batch after a
+    dropped connection.
+    Returns {'applied', 'duplicates', 'rejected', 'progress'}
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        received = set(
+            FlashcardReviewReceipt.objects.filter(user=user, event_id__in=[event[0] for event in events])
+            .values_list('event_id', flat=True)
+        )
+        pending = sorted((event for event in events if event[0] not in received), key=lambda event: event[3])
+
+        card_ids = {event[1] for event in pending}
+        known_cards = dict(FlashcardCard.objects.filter(id__in=card_ids).values_list('id', 'deck_id'))
+        parameters = get_parameters(user, set(known_cards.values()))
+        existing = {
+            progress.card_id: progress
+            for progress in UserFlashcardProgress.objects.select_for_update()
+            .filter(user=user, card_id__in=known_cards)
+        }
+
+        created, updated, rejected, applied, log = {}, {}, [], [], []
+        for event_id, card_id, grade, reviewed_at in pending:
+            if card_id not in known_cards:
+                rejected.append({'event_id': event_id, 'error': 'unknown card'})
+                continue
+            if card_id in existing:
+                progress = updated[card_id] = existing[card_id]
+            elif card_id in created:
+                progress = created[card_id]
+            else:
+                progress = created[card_id] = UserFlashcardProgress(user=user, card_id=card_id)
+            deck_id = known_cards[card_id]
+            log.append(log_entry(progress, deck_id, grade, reviewed_at))
+            review(progress, grade, reviewed_at, parameters[deck_id])
+            progress.updated_at = now
+            applied.append(event_id)
+
+        UserFlashcardProgress.objects.bulk_create(created.values())
+        touched = list(updated.values())
+        if touched:
+            UserFlashcardProgress.objects.bulk_update(touched, PROGRESS_FIELDS)
+        FlashcardReviewReceipt.objects.bulk_create(
+            [FlashcardReviewReceipt(user=user, event_id=event_id) for event_id in applied]
+        )
+        FlashcardReviewLog.objects.bulk_create(log)
+
+    return {
+        'applied': len(applied),
+        'duplicates': sorted(received),
+        'rejected': rejected,
+        'progress': [
+            {
+                'card_id': progress.card_id,
+                'interval_days': progress.interval_days,
+                'next_review_date': progress.next_review_date,
+                'is_mastered': progress.is_mastered,
+            }
+            for progress in [*created.values(), *touched]
+        ],
+    }
+
+
+def due_queue(user, deck, limit=DEFAULT_QUEUE_SIZE, today=None):
+    """
+    Up to `limit` (card, is_new) pairs: due reviews first (oldest first, read through
+    the (user, next_review_date) index), then unseen cards in deck order.
+    Two queries at most.
+    """
+    today = today or timezone.localdate()
+    due = list(
+        UserFlashcardProgress.objects
+        .filter(user=user, next_review_date__lte=today, card__deck=deck)
+        .select_related('card')
+        .order_by('next_review_date', 'id')[:limit]
+    )
+    queue = [(progress.card, False) for progress in due]
+
+    remaining = limit - len(queue)
+    if remaining > 0:
+        scheduled = UserFlashcardProgress.objects.filter(
+            user=user, card=OuterRef('pk'), next_review_date__isnull=False
+        )
+        queue.extend(
+            (card, True)
+            for card in FlashcardCard.objects.filter(deck=deck).filter(~Exists(scheduled))
+            .order_by('order', 'id')[:remaining]
+        )
+    return queue
+
+
+def study_window(user, deck, after=None, limit=STUDY_WINDOW, today=None):
+    """
+    One window of a study session: the deck's due and unseen cards in (order, id)
+    order after the `after` (order, id) keyset position, each with an is_new flag.
+    Returns (cards, next position or None when the deck is exhausted)
+    """
+    today = today or timezone.localdate()
+    progress = UserFlashcardProgress.objects.filter(user=user, card=OuterRef('pk'))
+    cards = (
+        FlashcardCard.objects.filter(deck=deck)
+        .filter(~Exists(progress.filter(next_review_date__gt=today)))
+        .annotate(is_new=~Exists(progress.filter(next_review_date__isnull=False)))
+        .only(*STUDY_CARD_FIELDS)
+        .order_by('order', 'id')
+    )
+    if after:
+        order, card_id = after
+        cards = cards.filter(Q(order__gt=order) | Q(order=order, id__gt=card_id))
+
+    cards = list(cards[:limit + 1])
+    if len(cards) <= limit:
+        return cards, None
+    cards = cards[:limit]
+    return cards, (cards[-1].order, cards[-1].id)
+
+
+def parse_study_position(value):
+    """(order, id) from an "order:id" window cursor; ValueError if malformed"""
+    order, card_id = (int(part) for part in value.split(':'))
+    return order, card_id
+
+
+def study_window_data(user, deck, after=None):
+    """JSON-ready study_window: {'cards': [...], 'next': "order:id" cursor or None}"""
+    cards, next_position = study_window(user, deck, after=after)
+    return {
+        'cards': [
+            {**{field: getattr(card, field) for field in STUDY_CARD_FIELDS}, 'is_new': card.is_new}
+            for card in cards
+        ],
+        'next': f'{next_position[0]}:{next_position[1]}' if next_position else None,
+    }
+
+
+def deck_summaries(user, decks, today=None):
+    """
+    {deck_id: {'due', 'new', 'learning', 'mastered'}} for the given decks, from one
+    grouped query over the user's progress rows (new = card_count - cards seen).
+    """
+    today = today or timezone.localdate()
+    counts = {
+        row['card__deck_id']: row
+        for row in UserFlashcardProgress.objects
+        .filter(user=user, next_review_date__isnull=False, card__deck__in=decks)
+        .values('card__deck_id')
+        .annotate(
+            seen=Count('id'),
+            due=Count('id', filter=Q(next_review_date__lte=today)),
+            mastered=Count('id', filter=Q(is_mastered=True)),
+        )
+    }
+    summaries = {}
+    for deck in decks:
+        row = counts.get(deck.id, {'seen': 0, 'due': 0, 'mastered': 0})
+        summaries[deck.id] = {
+            'due': row['due'],
+            'new': max(deck.card_count - row['seen'], 0),
+            'learning': row['seen'] - row['mastered'],
+            'mastered': row['mastered'],
+        }
+    return summaries
@@ -0,0 +1,169 @@
+"""
+Character-bigram inverted index over Kotoba words, examples and vocabulary
+
+Text is normalized (NFKC for full/half width, lower case, katakana folded to
+hiragana) before being split into bigrams, so a query typed in any of those
+forms finds the same postings. Each posting points at the KotobaWord the
+document belongs to; results are ranked per word.
+"""
+import re
+import unicodedata
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, Q
+
+from .models import KotobaWord, KotobaExample, KotobaVocabulary, KotobaSearchPosting
+
+_KATAKANA_TO_HIRAGANA = {code: code - 0x60 for code in range(0x30A1, 0x30F7)}
+_WHITESPACE = re.compile(r'\s+')
+
+# Weight of a match by the kind of document it came from
+DOC_WEIGHTS = {
+    KotobaSearchPosting.DOC_WORD: 1.0,
+    KotobaSearchPosting.DOC_VOCABULARY: 0.6,
+    KotobaSearchPosting.DOC_EXAMPLE: 0.4,
+}
+MAX_CANDIDATES = 200
+
+
+def normalize(text):
+    """Fold width, case and kana so that ｶｲｺﾞ, カイゴ and かいご compare equal"""
+    text = unicodedata.normalize('NFKC', text or '').lower().translate(_KATAKANA_TO_HIRAGANA)
+    return _WHITESPACE.sub(' ', text).strip()
+
+
+def bigrams(text):
+    """Distinct bigrams of each normalized token (a one-character token is kept as its own gram)"""
+    grams = set()
+    for token in normalize(text).split(' '):
+        if len(token) == 1:
+            grams.add(token)
+        grams.update(token[i:i + 2] for i in range(len(token) - 1))
+    return grams
+
+
+def _word_documents(words):
+    for word in words:
+        text = ' '.join([word.japanese_word, word.ruby_reading, word.indonesian_translation])
+        yield KotobaSearchPosting.DOC_WORD, word.word_id, word.word_id, text
+
+
+def _example_documents(examples):
+    for example in examples:
+        text = ' '.join([example.japanese_example, example.indonesian_example])
+        yield KotobaSearchPosting.DOC_EXAMPLE, example.example_id, example.word_id, text
+
+
+def _vocabulary_documents(vocabulary):
+    for vocab in vocabulary:
+        text = ' '.join([vocab.japanese_word, vocab.ruby_reading, vocab.indonesian_translation])
+        yield KotobaSearchPosting.DOC_VOCABULARY, vocab.vocabulary_id, vocab.example.word_id, text
+
+
+def _postings(documents):
+    return [
+        KotobaSearchPosting(gram=gram, doc_type=doc_type, doc_id=doc_id, word_id=word_id)
+        for doc_type, doc_id, word_id, text in documents
+        for gram in bigrams(text)
+    ]
+
+
+def rebuild_index(batch_size=5000):
+    """Rebuild the whole index from the Kotoba tables; returns the number of postings"""
+    postings = _postings(_word_documents(KotobaWord.objects.all()))
+    postings += _postings(_example_documents(KotobaExample.objects.all()))
+    postings += _postings(_vocabulary_documents(KotobaVocabulary.objects.select_related('example')))
+
+    with transaction.atomic():
+        KotobaSearchPosting.objects.all().delete()
+        KotobaSearchPosting.objects.bulk_create(postings, batch_size=batch_size)
+    return len(postings)
+
+
+def index_document(instance):
+    """Replace the postings of one saved word, example or vocabulary row"""
+    if isinstance(instance, KotobaWord):
+        documents = _word_documents([instance])
+    elif isinstance(instance, KotobaExample):
+        documents = _example_documents([instance])
+    else:
+        documents = _vocabulary_documents([instance])
+    documents = list(documents)
+
+    with transaction.atomic():
+        unindex_document(instance)
+        KotobaSearchPosting.objects.bulk_create(_postings(documents))
+
+
+def unindex_document(instance):
+    doc_type, doc_id = _document_key(instance)
+    KotobaSearchPosting.objects.filter(doc_type=doc_type, doc_id=doc_id).delete()
+
+
+def _document_key(instance):
+    if isinstance(instance, KotobaWord):
+        return KotobaSearchPosting.DOC_WORD, instance.word_id
+    if isinstance(instance, KotobaExample):
+        return KotobaSearchPosting.DOC_EXAMPLE, instance.example_id
+    return KotobaSearchPosting.DOC_VOCABULARY, instance.vocabulary_id
+
+
+def search(query, limit=20):
+    """
+    Ranked KotobaWord matches for a query.
+    Candidates come from one grouped posting query; the top candidates are
+    then re-scored on the word's own fields (exact > prefix > substring).
+    """
+    needle = normalize(query)
+    if not needle:
+        return []
+    grams = bigrams(needle)
+    if len(needle) > 1:
+        postings = KotobaSearchPosting.objects.filter(gram__in=grams)
+    else:
+        # A single character: its own gram or any bigram containing it
+        postings = KotobaSearchPosting.objects.filter(Q(gram__startswith=needle) | Q(gram__endswith=needle))
+
+    # Per (word, doc type): number of distinct query grams that matched
+    rows = (
+        postings
+        .values('word_id', 'doc_type')
+        .annotate(hits=Count('gram', distinct=True))
+    )
+    scores = defaultdict(float)
+    for row in rows:
+        coverage = min(row['hits'] / len(grams), 1)
+        scores[row['word_id']] = max(scores[row['word_id']], coverage * DOC_WEIGHTS[row['doc_type']])
+
+    candidates = sorted(scores, key=scores.get, reverse=True)[:MAX_CANDIDATES]
+    words = KotobaWord.objects.select_related('subcategory').in_bulk(candidates)
+
+    results = []
+    for word_id in candidates:
+        word = words.get(word_id)
+        if word is None:
+            continue
+        score = scores[word_id]
+        fields = [normalize(word.japanese_word), normalize(word.ruby_reading), normalize(word.indonesian_translation)]
+        if needle in fields:
+            score += 3
+        elif any(field.startswith(needle) for field in fields):
+            score += 2
+        elif any(needle in field for field in fields):
+            score += 1
+        results.append((score, word))
+
+    results.sort(key=lambda item: (-item[0], item[1].japanese_word))
+    return [
+        {
+            'word_id': word.word_id,
+            'japanese': word.japanese_word,
+            'ruby': word.ruby_reading,
+            'indonesian': word.indonesian_translation,
+            'category_key': word.main_category_id,
+            'subcategory_key': word.subcategory.subcategory_key,
+            'score': round(score, 3),
+        }
+        for score, word in results[:limit]
+    ]
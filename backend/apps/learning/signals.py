@@ -0,0 +1,96 @@
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import pre_save, post_save, post_delete
+from .kotoba_cache import bump_generation_on_commit
+from . import search
+from .models import (
+    KotobaCategory, KotobaSubcategory, KotobaWord, KotobaExample, KotobaVocabulary,
+    FlashcardDeck, FlashcardCard, SyncTombstone
+)
+
+KOTOBA_MODELS = [KotobaCategory, KotobaSubcategory, KotobaWord, KotobaExample, KotobaVocabulary]
+
+
+def invalidate_kotoba_caches(sender, **kwargs):
+    """Any Kotoba edit moves every Kotoba cache key to a new generation"""
+    bump_generation_on_commit()
+
+
+for model in KOTOBA_MODELS:
+    post_save.connect(invalidate_kotoba_caches, sender=model, dispatch_uid=f'kotoba_cache_save_{model.__name__}')
+    post_delete.connect(invalidate_kotoba_caches, sender=model, dispatch_uid=f'kotoba_cache_delete_{model.__name__}')
+
+
+def update_search_index(sender, instance, **kwargs):
+    """Re-index the saved word, example or vocabulary row once the edit commits"""
+    transaction.on_commit(lambda: search.index_document(instance))
+
+
+def remove_from_search_index(sender, instance, **kwargs):
+    search.unindex_document(instance)
+
+
+for model in [KotobaWord, KotobaExample, KotobaVocabulary]:
+    post_save.connect(update_search_index, sender=model, dispatch_uid=f'kotoba_search_save_{model.__name__}')
+    post_delete.connect(remove_from_search_index, sender=model, dispatch_uid=f'kotoba_search_delete_{model.__name__}')
+
+
+# Denormalized counters: (child model, [(parent model, FK attname, counter field), ...])
+COUNTERS = [
+    (KotobaWord, [
+        (KotobaCategory, 'main_category_id', 'word_count'),
+        (KotobaSubcategory, 'subcategory_id', 'word_count'),
+    ]),
+    (FlashcardCard, [
+        (FlashcardDeck, 'deck_id', 'card_count'),
+    ]),
+]
+
+
+def _adjust_counters(parents, instance_values, delta):
+    for (parent_model, _, counter), parent_id in zip(parents, instance_values):
+        if parent_id is not None:
+            parent_model.objects.filter(pk=parent_id).update(**{counter: F(counter) + delta})
+
+
+def _counter_receivers(parents):
+    attnames = [attname for _, attname, _ in parents]
+
+    def remember_parents(sender, instance, raw=False, **kwargs):
+        # Parents before the save, so a row moved to another parent adjusts both
+        if raw or instance._state.adding:
+            instance._counter_parents = None
+        else:
+            instance._counter_parents = sender.objects.filter(pk=instance.pk).values_list(*attnames).first()
+
+    def count_saved(sender, instance, created, raw=False, **kwargs):
+        if raw:
+            return
+        current = tuple(getattr(instance, attname) for attname in attnames)
+        previous = getattr(instance, '_counter_parents', None)
+        if created or previous is None:
+            _adjust_counters(parents, current, 1)
+        elif previous != current:
+            _adjust_counters(parents, previous, -1)
+            _adjust_counters(parents, current, 1)
+
+    def count_deleted(sender, instance, **kwargs):
+        _adjust_counters(parents, [getattr(instance, attname) for attname in attnames], -1)
+
+    return remember_parents, count_saved, count_deleted
+
+
+for model, parents in COUNTERS:
+    remember_parents, count_saved, count_deleted = _counter_receivers(parents)
+    pre_save.connect(remember_parents, sender=model, weak=False, dispatch_uid=f'counter_pre_save_{model.__name__}')
+    post_save.connect(count_saved, sender=model, weak=False, dispatch_uid=f'counter_save_{model.__name__}')
+    post_delete.connect(count_deleted, sender=model, weak=False, dispatch_uid=f'counter_delete_{model.__name__}')
+
+
+def record_tombstone(sender, instance, **kwargs):
+    """Deleted rows are reported to syncing clients through tombstones"""
+    SyncTombstone.objects.create(model_label=sender._meta.label, object_id=str(instance.pk))
+
+
+for model in [KotobaWord, KotobaExample, KotobaVocabulary, FlashcardDeck, FlashcardCard]:
+    post_delete.connect(record_tombstone, sender=model, dispatch_uid=f'sync_tombstone_{model.__name__}')
@@ -0,0 +1,178 @@
+"""
+Delta sync for Kotoba and flashcard content
+
+Each source is read in (updated_at, pk) keyset order after its own position
+in the cursor; deletes come from SyncTombstone in (deleted_at, id) order.
+The cursor is an opaque base64 JSON of those positions. Rows newer than
+now - SYNC_LAG are left for the next call so that a transaction that
+commits late with an earlier timestamp is not skipped. SYNC_LAG covers
+ordinary saves; long bulk loads hold the horizon before their start with
+sync_write_window() until they have committed.
+"""
+import base64
+import binascii
+import json
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import KotobaWord, KotobaExample, KotobaVocabulary, FlashcardDeck, FlashcardCard, SyncTombstone
+
+SYNC_LAG = timedelta(seconds=2)
+SYNC_BUSY_SINCE_KEY = 'sync_busy_since'  # Start of the earliest bulk write still in flight
+SYNC_BUSY_COUNT_KEY = 'sync_busy_count'  # Bulk writes in flight
+SYNC_BUSY_TIMEOUT = 3600  # Releases the horizon if a writer dies without leaving its window
+DEFAULT_PAGE_SIZE = 500
+MAX_PAGE_SIZE = 2000
+
+# (response key, model, fields sent to clients)
+SYNC_SOURCES = [
+    ('kotoba_words', KotobaWord, [
+        'word_id', 'main_category_id', 'subcategory_id', 'japanese_word', 'ruby_reading', 'indonesian_translation',
+    ]),
+    ('kotoba_examples', KotobaExample, [
+        'example_id', 'word_id', 'japanese_example', 'indonesian_example', 'order_number',
+    ]),
+    ('kotoba_vocabulary', KotobaVocabulary, [
+        'vocabulary_id', 'example_id', 'japanese_word', 'ruby_reading', 'indonesian_translation',
+    ]),
+    ('flashcard_decks', FlashcardDeck, [
+        'id', 'name', 'deck_type', 'description', 'is_premium', 'is_active', 'order',
+    ]),
+    ('flashcard_cards', FlashcardCard, [
+        'id', 'deck_id', 'front_text', 'back_text', 'front_reading', 'example_sentence',
+        'example_translation', 'notes', 'order',
+    ]),
+]
+TOMBSTONE_KEY = 'deleted'
+RESPONSE_KEYS = {model._meta.label: key for key, model, _ in SYNC_SOURCES}
+# Python type of the pk half of each cursor position (Kotoba tables have string keys)
+CURSOR_PK_TYPES = {
+    key: int if model._meta.pk.get_internal_type() in ('AutoField', 'BigAutoField') else str
+    for key, model, _ in SYNC_SOURCES
+}
+CURSOR_PK_TYPES[TOMBSTONE_KEY] = int
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(positions):
+    return base64.urlsafe_b64encode(json.dumps(positions, separators=(',', ':')).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """{source key: [updated_at ISO string, pk]}; an empty cursor means a full sync"""
+    if not cursor:
+        return {}
+    try:
+        positions = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        if not isinstance(positions, dict):
+            raise ValueError(positions)
+        for key, (timestamp, pk) in positions.items():
+            pk_type = CURSOR_PK_TYPES.get(key)
+            # bool is an int subclass but never a valid pk
+            if pk_type is None or type(pk) is not pk_type:
+                raise ValueError(key)
+            if parse_datetime(timestamp) is None:
+                raise ValueError(key)
+        return positions
+    except (ValueError, TypeError, AttributeError, binascii.Error) as e:
+        raise InvalidCursor('Invalid sync cursor') from e
+
+
+@contextmanager
+def sync_write_window():
+    """
+    Keep the sync horizon before the start of a long write transaction.
+    Wrap the whole transaction (and the timestamps it writes) so the window
+    closes only after the commit; overlapping windows keep the earliest start.
+    """
+    cache.add(SYNC_BUSY_SINCE_KEY, timezone.now(), timeout=SYNC_BUSY_TIMEOUT)
+    if not cache.add(SYNC_BUSY_COUNT_KEY, 1, timeout=SYNC_BUSY_TIMEOUT):
+        try:
+            cache.incr(SYNC_BUSY_COUNT_KEY)
+        except ValueError:
+            cache.set(SYNC_BUSY_COUNT_KEY, 1, timeout=SYNC_BUSY_TIMEOUT)
+    try:
+        yield
+    finally:
+        try:
+            remaining = cache.decr(SYNC_BUSY_COUNT_KEY)
+        except ValueError:
+            remaining = 0
+        if remaining <= 0:
+            cache.delete_many([SYNC_BUSY_SINCE_KEY, SYNC_BUSY_COUNT_KEY])
+
+
+def sync_horizon():
+    """Latest timestamp that is safe to hand out: now - SYNC_LAG, and before any open write window"""
+    horizon = timezone.now() - SYNC_LAG
+    busy_since = cache.get(SYNC_BUSY_SINCE_KEY)
+    if busy_since is not None:
+        horizon = min(horizon, busy_since - timedelta(microseconds=1))
+    return horizon
+
+
+def _after(queryset, time_field, pk_field, position):
+    if not position:
+        return queryset
+    timestamp, pk = parse_datetime(position[0]), position[1]
+    return queryset.filter(
+        Q(**{f'{time_field}__gt': timestamp}) | Q(**{time_field: timestamp, f'{pk_field}__gt': pk})
+    )
+
+
+def collect_changes(cursor, limit=DEFAULT_PAGE_SIZE):
+    """
+    Up to `limit` changed rows plus tombstones after the cursor.
+    Returns {'changes': {key: [rows]}, 'deleted': {key: [{'id', 'deleted_at'}]}, 'cursor', 'has_more'}
+    """
+    positions = decode_cursor(cursor)
+    horizon = sync_horizon()
+    remaining = limit
+    has_more = False
+    changes = {}
+
+    for key, model, fields in SYNC_SOURCES:
+        pk_field = model._meta.pk.name
+        queryset = _after(
+            model.objects.filter(updated_at__lte=horizon), 'updated_at', pk_field, positions.get(key)
+        ).order_by('updated_at', pk_field)
+        rows = list(queryset.values(*fields, 'updated_at')[:remaining + 1]) if remaining else []
+        if len(rows) > remaining or (not remaining and queryset.exists()):
+            has_more = True
+            rows = rows[:remaining]
+        if rows:
+            last = rows[-1]
+            positions[key] = [last['updated_at'].isoformat(), last[pk_field]]
+        remaining -= len(rows)
+        changes[key] = rows
+
+    deleted = {key: [] for key, _, _ in SYNC_SOURCES}
+    tombstones = _after(
+        SyncTombstone.objects.filter(deleted_at__lte=horizon), 'deleted_at', 'id', positions.get(TOMBSTONE_KEY)
+    ).order_by('deleted_at', 'id')
+    tombstone_rows = list(tombstones.values('id', 'model_label', 'object_id', 'deleted_at')[:remaining + 1]) if remaining else []
+    if len(tombstone_rows) > remaining or (not remaining and tombstones.exists()):
+        has_more = True
+        tombstone_rows = tombstone_rows[:remaining]
+    for tombstone in tombstone_rows:
+        key = RESPONSE_KEYS.get(tombstone['model_label'])
+        if key:
+            deleted[key].append({'id': tombstone['object_id'], 'deleted_at': tombstone['deleted_at']})
+    if tombstone_rows:
+        last = tombstone_rows[-1]
+        positions[TOMBSTONE_KEY] = [last['deleted_at'].isoformat(), last['id']]
+
+    return {
+        'changes': changes,
+        'deleted': deleted,
+        'cursor': encode_cursor(positions),
+        'has_more': has_more,
+    }
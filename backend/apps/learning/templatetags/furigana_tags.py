@@ -0,0 +1,14 @@
+from django import template
+from django.utils.safestring import mark_safe
+from apps.learning.furigana import annotate
+
+register = template.Library()
+
+
+@register.filter
+def furigana(text):
+    """
+    Plain Japanese text with <ruby> readings for every known word
+    {{ example.japanese|furigana }}
+    """
+    return mark_safe(annotate(str(text or '')))
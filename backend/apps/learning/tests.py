@@ -0,0 +1,260 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.users.models import User
+from . import scheduler, sync
+from .models import (
+    FlashcardDeck, FlashcardCard, UserFlashcardProgress, FlashcardReviewReceipt, FlashcardReviewLog
+)
+
+
+class SchedulerTests(TestCase):
+    """SM-2 updates and idempotent batch submission of offline reviews"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='learner', email='learner@example.com', password='pw')
+        cls.deck = FlashcardDeck.objects.create(name='deck')
+        cls.cards = [
+            FlashcardCard.objects.create(deck=cls.deck, front_text=f'front {i}', back_text=f'back {i}', order=i)
+            for i in range(3)
+        ]
+
+    def event(self, event_id, card, grade=scheduler.GOOD, minutes_ago=0):
+        return {
+            'event_id': event_id,
+            'card_id': card.id,
+            'grade': grade,
+            'reviewed_at': (timezone.now() - timedelta(minutes=minutes_ago)).isoformat(),
+        }
+
+    def test_sm2_intervals_grow_on_good_and_reset_on_again(self):
+        ease, interval, repetitions = 2.5, 0, 0
+        intervals = []
+        for _ in range(4):
+            ease, interval, repetitions = scheduler.sm2(ease, interval, repetitions, scheduler.GOOD)
+            intervals.append(interval)
+        self.assertEqual(intervals, [1, 6, 15, 38])
+
+        ease_after_lapse, interval, repetitions = scheduler.sm2(ease, interval, repetitions, scheduler.AGAIN)
+        self.assertEqual((interval, repetitions), (scheduler.FIRST_INTERVAL, 0))
+        self.assertLess(ease_after_lapse, ease)
+        self.assertGreaterEqual(scheduler.sm2(scheduler.MIN_EASE, 1, 0, scheduler.AGAIN)[0], scheduler.MIN_EASE)
+
+    def test_parse_review_events_validates_and_deduplicates(self):
+        future = (timezone.now() + timedelta(days=1)).isoformat()
+        events, rejected = scheduler.parse_review_events([
+            self.event('a', self.cards[0]),
+            self.event('a', self.cards[1]),  # same id again in one batch
+            {'event_id': 'b', 'card_id': self.cards[0].id, 'grade': 7, 'reviewed_at': future},
+            {'event_id': 'c', 'card_id': 'x', 'grade': 3, 'reviewed_at': future},
+            {'event_id': 'd', 'card_id': self.cards[0].id, 'grade': 3, 'reviewed_at': 'yesterday'},
+            {'event_id': '', 'card_id': self.cards[0].id, 'grade': 3, 'reviewed_at': future},
+            'not an object',
+            {'event_id': 'e', 'card_id': self.cards[0].id, 'grade': 3, 'reviewed_at': future},
+        ])
+        self.assertEqual([event[0] for event in events], ['a', 'e'])
+        self.assertEqual(events[0][1], self.cards[0].id)
+        self.assertLessEqual(events[1][3], timezone.now())  # future timestamps are clamped
+        self.assertEqual([item['event_id'] for item in rejected], ['b', 'c', 'd', '', ''])
+
+    def test_resending_a_batch_is_harmless(self):
+        events, _ = scheduler.parse_review_events([
+            self.event('r1', self.cards[0], minutes_ago=10),
+            self.event('r2', self.cards[0], minutes_ago=5),
+            self.event('r3', self.cards[1], grade=scheduler.AGAIN),
+        ])
+        first = scheduler.apply_review_batch(self.user, events)
+        self.assertEqual(first['applied'], 3)
+        self.assertEqual(first['duplicates'], [])
+        snapshot = list(
+            UserFlashcardProgress.objects.filter(user=self.user).order_by('card_id')
+            .values_list('card_id', 'repetitions', 'interval_days', 'total_reviews', 'next_review_date')
+        )
+        self.assertEqual([row[1:4] for row in snapshot], [(2, 6, 2), (0, 1, 1)])
+
+        second = scheduler.apply_review_batch(self.user, events)
+        self.assertEqual(second['applied'], 0)
+        self.assertEqual(second['duplicates'], ['r1', 'r2', 'r3'])
+        self.assertEqual(second['progress'], [])
+        self.assertEqual(
+            list(
+                UserFlashcardProgress.objects.filter(user=self.user).order_by('card_id')
+                .values_list('card_id', 'repetitions', 'interval_days', 'total_reviews', 'next_review_date')
+            ),
+            snapshot
+        )
+        self.assertEqual(FlashcardReviewReceipt.objects.filter(user=self.user).count(), 3)
+        self.assertEqual(FlashcardReviewLog.objects.filter(user_id=self.user.id).count(), 3)
+
+    def test_partially_resent_batch_applies_only_new_events(self):
+        events, _ = scheduler.parse_review_events([self.event('p1', self.cards[2], minutes_ago=10)])
+        scheduler.apply_review_batch(self.user, events)
+
+        events, _ = scheduler.parse_review_events([
+            self.event('p1', self.cards[2], minutes_ago=10),
+            self.event('p2', self.cards[2]),
+        ])
+        result = scheduler.apply_review_batch(self.user, events)
+        self.assertEqual((result['applied'], result['duplicates']), (1, ['p1']))
+        progress = UserFlashcardProgress.objects.get(user=self.user, card=self.cards[2])
+        self.assertEqual((progress.repetitions, progress.total_reviews), (2, 2))
+
+    def test_events_are_replayed_in_reviewed_at_order(self):
+        # Submitted newest first; the lapse happened last, so the card ends up reset
+        events, _ = scheduler.parse_review_events([
+            self.event('o3', self.cards[0], grade=scheduler.AGAIN, minutes_ago=1),
+            self.event('o1', self.cards[0], minutes_ago=20),
+            self.event('o2', self.cards[0], minutes_ago=10),
+        ])
+        scheduler.apply_review_batch(self.user, events)
+        progress = UserFlashcardProgress.objects.get(user=self.user, card=self.cards[0])
+        self.assertEqual((progress.repetitions, progress.interval_days), (0, scheduler.FIRST_INTERVAL))
+        self.assertEqual(progress.last_difficulty, scheduler.AGAIN)
+
+    def test_unknown_card_is_rejected_without_a_receipt(self):
+        events = [('u1', self.cards[-1].id + 1000, scheduler.GOOD, timezone.now())]
+        result = scheduler.apply_review_batch(self.user, events)
+        self.assertEqual(result['applied'], 0)
+        self.assertEqual(result['rejected'], [{'event_id': 'u1', 'error': 'unknown card'}])
+        self.assertFalse(FlashcardReviewReceipt.objects.filter(user=self.user).exists())
+
+
+class ReviewBatchViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='learner', email='learner@example.com', password='pw')
+        deck = FlashcardDeck.objects.create(name='deck')
+        cls.card = FlashcardCard.objects.create(deck=deck, front_text='front', back_text='back')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = reverse('flashcard_review_batch')
+        self.reviews = [{
+            'event_id': 'v1', 'card_id': self.card.id, 'grade': scheduler.GOOD,
+            'reviewed_at': timezone.now().isoformat(),
+        }]
+
+    def test_resend_reports_duplicates(self):
+        response = self.client.post(self.url, {'reviews': self.reviews}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['applied'], 1)
+
+        response = self.client.post(self.url, {'reviews': self.reviews}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['applied'], response.data['duplicates']), (0, ['v1']))
+
+    def test_concurrent_duplicate_returns_409_and_writes_nothing(self):
+        # Another request committed the receipt after this one looked for it
+        FlashcardReviewReceipt.objects.create(user=self.user, event_id='v1')
+        with mock.patch.object(
+            FlashcardReviewReceipt.objects, 'filter', return_value=FlashcardReviewReceipt.objects.none()
+        ):
+            response = self.client.post(self.url, {'reviews': self.reviews}, format='json')
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(UserFlashcardProgress.objects.filter(user=self.user).exists())
+        self.assertFalse(FlashcardReviewLog.objects.exists())
+
+    def test_rejects_oversized_batch(self):
+        reviews = self.reviews * (scheduler.MAX_BATCH_SIZE + 1)
+        response = self.client.post(self.url, {'reviews': reviews}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+@mock.patch.object(sync, 'SYNC_LAG', timedelta(0))
+class SyncTests(TestCase):
+    """Delta sync cursors: round-trip, paging, deltas, tombstones and the write-window horizon"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='learner', email='learner@example.com', password='pw')
+        cls.deck = FlashcardDeck.objects.create(name='deck')
+        cls.cards = [
+            FlashcardCard.objects.create(deck=cls.deck, front_text=f'front {i}', back_text=f'back {i}', order=i)
+            for i in range(5)
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def sync_all(self, cursor='', limit=sync.DEFAULT_PAGE_SIZE):
+        """Follow has_more to the end; returns (changed card ids in order, deleted ids, final cursor)"""
+        card_ids, deleted = [], []
+        while True:
+            page = sync.collect_changes(cursor, limit=limit)
+            card_ids += [row['id'] for row in page['changes']['flashcard_cards']]
+            deleted += [row['id'] for row in page['deleted']['flashcard_cards']]
+            cursor = page['cursor']
+            if not page['has_more']:
+                return card_ids, deleted, cursor
+
+    def test_cursor_round_trip(self):
+        positions = {
+            'kotoba_words': ['2024-01-01T00:00:00+00:00', 'w001'],
+            'flashcard_cards': ['2024-01-01T00:00:00.123456+00:00', 42],
+            sync.TOMBSTONE_KEY: ['2024-01-02T00:00:00+00:00', 7],
+        }
+        self.assertEqual(sync.decode_cursor(sync.encode_cursor(positions)), positions)
+        self.assertEqual(sync.decode_cursor(''), {})
+
+    def test_malformed_cursors_are_rejected(self):
+        bad_positions = [
+            ['not', 'a', 'dict'],
+            {'unknown_source': ['2024-01-01T00:00:00Z', 1]},
+            {'flashcard_cards': ['2024-01-01T00:00:00Z', 'abc']},
+            {'flashcard_cards': ['2024-01-01T00:00:00Z', [1]]},
+            {'flashcard_cards': ['2024-01-01T00:00:00Z', True]},
+            {'kotoba_words': ['2024-01-01T00:00:00Z', 5]},
+            {'flashcard_cards': ['yesterday', 1]},
+            {'flashcard_cards': ['2024-01-01T00:00:00Z']},
+        ]
+        for positions in bad_positions:
+            with self.subTest(positions=positions), self.assertRaises(sync.InvalidCursor):
+                sync.decode_cursor(sync.encode_cursor(positions))
+        with self.assertRaises(sync.InvalidCursor):
+            sync.decode_cursor('!!not base64!!')
+
+    def test_view_returns_400_for_a_malformed_cursor(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        cursor = sync.encode_cursor({'flashcard_cards': ['2024-01-01T00:00:00Z', 'abc']})
+        response = client.get(reverse('sync'), {'since': cursor})
+        self.assertEqual(response.status_code, 400)
+
+    def test_paging_returns_every_row_once(self):
+        card_ids, _, _ = self.sync_all(limit=2)
+        self.assertEqual(sorted(card_ids), sorted(card.id for card in self.cards))
+
+    def test_repeat_sync_transfers_only_deltas(self):
+        _, _, cursor = self.sync_all()
+        self.assertEqual(self.sync_all(cursor)[:2], ([], []))
+
+        changed = self.cards[2]
+        changed.back_text = 'changed'
+        changed.save()
+        removed_id = self.cards[4].id
+        self.cards[4].delete()
+
+        card_ids, deleted, cursor = self.sync_all(cursor)
+        self.assertEqual(card_ids, [changed.id])
+        self.assertEqual(deleted, [str(removed_id)])
+        self.assertEqual(self.sync_all(cursor)[:2], ([], []))
+
+    def test_open_write_window_holds_the_horizon(self):
+        _, _, cursor = self.sync_all()
+        with sync.sync_write_window():
+            # Visible now, but stamped after a bulk write that has not committed yet began
+            FlashcardCard.objects.filter(pk=self.cards[0].pk).update(updated_at=timezone.now())
+            self.assertEqual(self.sync_all(cursor)[0], [])
+            with sync.sync_write_window():
+                pass
+            self.assertEqual(self.sync_all(cursor)[0], [])  # an overlapping window closing keeps it held
+        self.assertEqual(self.sync_all(cursor)[0], [self.cards[0].id])
+        self.assertIsNone(cache.get(sync.SYNC_BUSY_SINCE_KEY))
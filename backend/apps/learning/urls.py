@@ -3,7 +3,9 @@ from rest_framework.routers import DefaultRouter
 from .views import (
     SubjectViewSet, QuestionViewSet, WordViewSet,
     FlashCardViewSet, VideoViewSet, StudyTextViewSet,
-    SubjectItemViewSet, ChapterViewSet, PageViewSet, UserProgressViewSet
+    SubjectItemViewSet, ChapterViewSet, PageViewSet, UserProgressViewSet,
+    KotobaSearchView, KotobaAutocompleteView, SyncView, FlashcardQueueView,
+    FlashcardReviewBatchView
 )
 
 router = DefaultRouter()
@@ -22,4 +24,9 @@ router.register(r'progress', UserProgressViewSet, basename='userprogress')
 
 urlpatterns = [
     path('', include(router.urls)),
+    path('kotoba/search/', KotobaSearchView.as_view(), name='kotoba_search'),
+    path('kotoba/autocomplete/', KotobaAutocompleteView.as_view(), name='kotoba_autocomplete'),
+    path('sync/', SyncView.as_view(), name='sync'),
+    path('flashcard-decks/<int:deck_id>/queue/', FlashcardQueueView.as_view(), name='flashcard_queue'),
+    path('flashcard-reviews/batch/', FlashcardReviewBatchView.as_view(), name='flashcard_review_batch'),
 ]
\ No newline at end of file
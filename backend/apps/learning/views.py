@@ -1,13 +1,19 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
+from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
+from django.db import IntegrityError
 from django.db.models import Q
+from django.shortcuts import get_object_or_404
 from django.utils import timezone
+from apps.subscriptions.decorators import ACCESS_FREE, ACCESS_AUTHENTICATED
 from .models import (
     Subject, Question, Word, FlashCard, Video, StudyText,
-    SubjectItem, Chapter, Page, UserProgress
+    SubjectItem, Chapter, Page, UserProgress, FlashcardDeck
 )
+from . import search, sync, scheduler
+from .autocomplete import get_autocompleter
 from .serializers import (
     SubjectSerializer, QuestionSerializer, WordSerializer,
     FlashCardSerializer, VideoSerializer, StudyTextSerializer,
@@ -16,6 +22,7 @@ from .serializers import (
 )
 
 class SubjectViewSet(viewsets.ReadOnlyModelViewSet):
+    access_policy = ACCESS_FREE
     queryset = Subject.objects.filter(is_active=True).prefetch_related(
         'items__chapters__pages__texts'
     )
@@ -67,6 +74,8 @@ class SubjectViewSet(viewsets.ReadOnlyModelViewSet):
         return Response(serializer.data)
 
 class QuestionViewSet(viewsets.ReadOnlyModelViewSet):
+    # Premium rows are filtered per user via is_premium
+    access_policy = ACCESS_AUTHENTICATED
     serializer_class = QuestionSerializer
     permission_classes = [IsAuthenticated]
 
@@ -74,7 +83,7 @@ class QuestionViewSet(viewsets.ReadOnlyModelViewSet):
         queryset = Question.objects.all()
         user = self.request.user
 
-        if not user.is_premium:
+        if not user.has_premium_access():
             queryset = queryset.filter(is_premium=False)
 
         question_type = self.request.query_params.get('type')
@@ -99,6 +108,7 @@ class QuestionViewSet(viewsets.ReadOnlyModelViewSet):
         return Response(serializer.data)
 
 class WordViewSet(viewsets.ReadOnlyModelViewSet):
+    access_policy = ACCESS_AUTHENTICATED
     serializer_class = WordSerializer
     permission_classes = [IsAuthenticated]
 
@@ -106,7 +116,7 @@ class WordViewSet(viewsets.ReadOnlyModelViewSet):
         queryset = Word.objects.all()
         user = self.request.user
 
-        if not user.is_premium:
+        if not user.has_premium_access():
             queryset = queryset.filter(is_premium=False)
 
         category = self.request.query_params.get('category')
@@ -148,6 +158,7 @@ class FlashCardViewSet(viewsets.ModelViewSet):
         return Response({'review_count': flashcard.review_count})
 
 class VideoViewSet(viewsets.ReadOnlyModelViewSet):
+    access_policy = ACCESS_AUTHENTICATED
     serializer_class = VideoSerializer
     permission_classes = [IsAuthenticated]
 
@@ -155,7 +166,7 @@ class VideoViewSet(viewsets.ReadOnlyModelViewSet):
         queryset = Video.objects.all()
         user = self.request.user
 
-        if not user.is_premium:
+        if not user.has_premium_access():
             queryset = queryset.filter(is_premium=False)
 
         subject_id = self.request.query_params.get('subject')
@@ -196,6 +207,7 @@ class ChapterViewSet(viewsets.ReadOnlyModelViewSet):
         return Response(serializer.data)
 
 class PageViewSet(viewsets.ReadOnlyModelViewSet):
+    access_policy = ACCESS_AUTHENTICATED
     serializer_class = PageSerializer
     permission_classes = [IsAuthenticated]
 
@@ -209,13 +221,14 @@ class PageViewSet(viewsets.ReadOnlyModelViewSet):
         user = self.request.user
 
         texts = page.texts.all()
-        if not user.is_premium:
+        if not user.has_premium_access():
             texts = texts.filter(is_premium=False)
 
         serializer = StudyTextSerializer(texts, many=True)
         return Response(serializer.data)
 
 class StudyTextViewSet(viewsets.ReadOnlyModelViewSet):
+    access_policy = ACCESS_AUTHENTICATED
     serializer_class = StudyTextSerializer
     permission_classes = [IsAuthenticated]
 
@@ -223,7 +236,7 @@ class StudyTextViewSet(viewsets.ReadOnlyModelViewSet):
         queryset = StudyText.objects.all()
         user = self.request.user
 
-        if not user.is_premium:
+        if not user.has_premium_access():
             queryset = queryset.filter(is_premium=False)
 
         page_id = self.request.query_params.get('page')
@@ -276,4 +289,110 @@ class UserProgressViewSet(viewsets.ModelViewSet):
 
         progress = self.get_queryset().filter(subject_id=subject_id)
         serializer = self.get_serializer(progress, many=True)
-        return Response(serializer.data)
\ No newline at end of file
+        return Response(serializer.data)
+
+class KotobaSearchView(APIView):
+    """Ranked search over Kotoba words, readings, translations, examples and vocabulary"""
+    access_policy = ACCESS_AUTHENTICATED
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({'error': 'q is required'}, status=400)
+
+        try:
+            limit = min(max(int(request.query_params.get('limit', 20)), 1), 100)
+        except ValueError:
+            limit = 20
+
+        return Response({
+            'query': query,
+            'results': search.search(query, limit=limit)
+        })
+
+class KotobaAutocompleteView(APIView):
+    """Prefix suggestions for Kotoba readings, words and Indonesian glosses, most reviewed first"""
+    access_policy = ACCESS_AUTHENTICATED
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        prefix = request.query_params.get('q', '')
+        try:
+            limit = min(max(int(request.query_params.get('limit', 10)), 1), 20)
+        except ValueError:
+            limit = 10
+
+        return Response({
+            'query': prefix,
+            'suggestions': get_autocompleter().suggest(prefix, limit=limit)
+        })
+
+class SyncView(APIView):
+    """Kotoba and flashcard rows changed or deleted since the client's cursor"""
+    access_policy = ACCESS_AUTHENTICATED
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        try:
+            limit = min(max(int(request.query_params.get('limit', sync.DEFAULT_PAGE_SIZE)), 1), sync.MAX_PAGE_SIZE)
+        except ValueError:
+            limit = sync.DEFAULT_PAGE_SIZE
+
+        try:
+            return Response(sync.collect_changes(request.query_params.get('since', ''), limit=limit))
+        except sync.InvalidCursor as e:
+            return Response({'error': str(e)}, status=400)
+
+class FlashcardQueueView(APIView):
+    """The next due and new cards of a deck for the current user"""
+    access_policy = ACCESS_AUTHENTICATED
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, deck_id):
+        deck = get_object_or_404(FlashcardDeck, id=deck_id, is_active=True)
+        try:
+            limit = min(max(int(request.query_params.get('limit', scheduler.DEFAULT_QUEUE_SIZE)), 1), scheduler.MAX_QUEUE_SIZE)
+        except ValueError:
+            limit = scheduler.DEFAULT_QUEUE_SIZE
+
+        return Response({
+            'deck': deck.id,
+            'cards': [
+                {
+                    'id': card.id,
+                    'front_text': card.front_text,
+                    'front_reading': card.front_reading,
+                    'back_text': card.back_text,
+                    'example_sentence': card.example_sentence,
+                    'example_translation': card.example_translation,
+                    'notes': card.notes,
+                    'is_new': is_new,
+                }
+                for card, is_new in scheduler.due_queue(request.user, deck, limit=limit)
+            ]
+        })
+
+class FlashcardReviewBatchView(APIView):
+    """Apply a batch of offline flashcard reviews; resending a batch is harmless"""
+    access_policy = ACCESS_AUTHENTICATED
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        reviews = request.data.get('reviews')
+        if not isinstance(reviews, list):
+            return Response({'error': 'reviews must be a list'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(reviews) > scheduler.MAX_BATCH_SIZE:
+            return Response(
+                {'error': f'At most {scheduler.MAX_BATCH_SIZE} reviews per batch'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        events, rejected = scheduler.parse_review_events(reviews)
+        try:
+            result = scheduler.apply_review_batch(request.user, events)
+        except IntegrityError:
+            # The same batch is being applied concurrently; the client retries
+            return Response({'error': 'Batch already in progress'}, status=status.HTTP_409_CONFLICT)
+        result['rejected'] = rejected + result['rejected']
+        return Response(result)
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import SubscriptionPlan, Subscription, Payment
+from .models import SubscriptionPlan, Subscription, Payment, StripeEvent
 
 @admin.register(SubscriptionPlan)
 class SubscriptionPlanAdmin(admin.ModelAdmin):
@@ -19,4 +19,11 @@ class PaymentAdmin(admin.ModelAdmin):
     list_display = ['user', 'subscription', 'amount', 'currency', 'status', 'created_at']
     list_filter = ['status', 'currency']
     search_fields = ['user__email', 'stripe_payment_intent_id']
-    ordering = ['-created_at']
\ No newline at end of file
+    ordering = ['-created_at']
+
+@admin.register(StripeEvent)
+class StripeEventAdmin(admin.ModelAdmin):
+    list_display = ['event_id', 'event_type', 'status', 'attempts', 'received_at', 'processed_at']
+    list_filter = ['status', 'event_type']
+    search_fields = ['event_id']
+    ordering = ['-received_at']
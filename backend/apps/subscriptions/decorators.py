@@ -4,6 +4,21 @@ from django.contrib import messages
 from django.http import JsonResponse
 from apps.subscriptions.models import Subscription
 
+# SubscriptionRequiredMiddleware のルートアクセスポリシー
+ACCESS_FREE = 'free'
+ACCESS_AUTHENTICATED = 'authenticated'
+ACCESS_PREMIUM = 'premium'
+
+def access_policy(policy):
+    """
+    ルートのアクセスポリシーを宣言するデコレーター
+    ビュー関数・ビュークラスの両方に使用でき、ミドルウェア起動時に読み込まれる
+    """
+    def decorator(view):
+        view.access_policy = policy
+        return view
+    return decorator
+
 def subscription_required(view_func):
     """
     ビューレベルでサブスクリプションを要求するデコレーター
@@ -19,7 +34,7 @@ def subscription_required(view_func):
             return view_func(request, *args, **kwargs)
 
         # アクティブなサブスクリプションをチェック
-        active_subscription = Subscription.get_user_active_subscription(request.user)
+        active_subscription = Subscription.get_cached_entitlement(request.user)
 
         if not active_subscription:
             messages.warning(request, 'このコンテンツにアクセスするにはプレミアムプランの登録が必要です。')
@@ -47,7 +62,7 @@ def api_subscription_required(view_func):
             return view_func(request, *args, **kwargs)
 
         # アクティブなサブスクリプションをチェック
-        active_subscription = Subscription.get_user_active_subscription(request.user)
+        active_subscription = Subscription.get_cached_entitlement(request.user)
 
         if not active_subscription:
             return JsonResponse({
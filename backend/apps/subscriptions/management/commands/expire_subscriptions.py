@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from apps.subscriptions.models import Subscription
+
+
+class Command(BaseCommand):
+    help = 'Expire lapsed subscriptions and downgrade users without an active plan'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of rows updated per UPDATE statement'
+        )
+
+    def handle(self, *args, **options):
+        expired_count, downgraded_count = Subscription.expire_lapsed(batch_size=options['batch_size'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Expired {expired_count} subscriptions, downgraded {downgraded_count} users'
+        ))
@@ -1,68 +1,140 @@
 from django.shortcuts import redirect
-from django.urls import reverse
+from django.urls import reverse, get_resolver, URLPattern, URLResolver
 from django.contrib import messages
-from django.utils import timezone
+from django.contrib.auth.models import AnonymousUser
+from django.http import JsonResponse
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
 from apps.subscriptions.models import Subscription
+from apps.subscriptions.decorators import ACCESS_FREE, ACCESS_AUTHENTICATED, ACCESS_PREMIUM
 
 class SubscriptionRequiredMiddleware:
     """
     サブスクリプションが必要なページへのアクセスを制御するミドルウェア
+    起動時に URLconf からルートごとのアクセスポリシー表を作成し、
+    リクエスト毎には resolver_match.route で1回だけ参照する
     """
 
-    # サブスクリプション不要なパス
-    EXEMPT_PATHS = [
-        '/admin/',
-        '/api/auth/',
-        '/login/',
-        '/logout/',
-        '/register/',
-        '/',  # ランディングページ
-        '/static/',
-        '/media/',
-        '/stripe/webhook/',  # Stripe Webhook
-        '/subscription/plans/',  # プラン一覧
-        '/subscription/checkout/',  # チェックアウト
+    # ビューでポリシー宣言がない場合に無料扱いとするルートの接頭辞（表の作成時のみ使用）
+    EXEMPT_PREFIXES = [
+        'admin/',
+        'learning-admin/',
+        'api/auth/',
+        'api/schema/',
+        'api/docs/',
+        'static/',
+        'media/',
     ]
 
     def __init__(self, get_response):
         self.get_response = get_response
+        self.policies = self.build_policy_table()
 
     def __call__(self, request):
-        # デコレーターでスキップ指定されている場合
-        if hasattr(request, 'skip_subscription_check') and request.skip_subscription_check:
-            return self.get_response(request)
+        return self.get_response(request)
 
-        # 認証不要なパスはスキップ
-        if any(request.path.startswith(path) for path in self.EXEMPT_PATHS):
-            return self.get_response(request)
+    @classmethod
+    def build_policy_table(cls, urlconf=None):
+        """URLconf を走査して {route: policy} の表を作成"""
+        policies = {}
+        cls._collect_policies(get_resolver(urlconf).url_patterns, '', policies)
+        return policies
 
-        # 未認証ユーザーはログインページへ
-        if not request.user.is_authenticated:
-            if not request.path.startswith('/api/'):
+    @classmethod
+    def _collect_policies(cls, patterns, prefix, policies):
+        for pattern in patterns:
+            if isinstance(pattern, URLResolver):
+                route = cls._join_route(prefix, str(pattern.pattern))
+                cls._collect_policies(pattern.url_patterns, route, policies)
+            elif isinstance(pattern, URLPattern):
+                route = cls._join_route(prefix, str(pattern.pattern))
+                # 同じルートが複数ある場合は先に登録された方が解決されるため上書きしない
+                policies.setdefault(route, cls._resolve_policy(pattern.callback, route))
+
+    @staticmethod
+    def _join_route(route1, route2):
+        """ResolverMatch.route と同じ規則でルートを連結"""
+        if not route1:
+            return route2
+        if route2.startswith('^'):
+            route2 = route2[1:]
+        return route1 + route2
+
+    @classmethod
+    def _resolve_policy(cls, callback, route):
+        # デコレーターで宣言されたポリシー（@allow_free_access, @access_policy）
+        policy = getattr(callback, 'access_policy', None)
+        if policy:
+            return policy
+
+        # ビュークラス属性で宣言されたポリシー（DRF ViewSet / Django CBV）
+        view_class = getattr(callback, 'cls', None) or getattr(callback, 'view_class', None)
+        policy = getattr(view_class, 'access_policy', None)
+        if policy:
+            return policy
+
+        if any(route.lstrip('^').startswith(prefix) for prefix in cls.EXEMPT_PREFIXES):
+            return ACCESS_FREE
+
+        return ACCESS_PREMIUM
+
+    @staticmethod
+    def _authenticate_api(request):
+        """
+        DRF の認証クラス（JWT）で API リクエストのユーザーを取得（request.user は変更しない）
+        ビューより前に動くミドルウェアでは request.user はセッションのユーザーのみのため
+        不正なトークンは匿名ユーザーとして扱い、401 はビュー側の DRF に任せる
+        """
+        drf_request = Request(request)
+        for authentication_class in api_settings.DEFAULT_AUTHENTICATION_CLASSES:
+            try:
+                result = authentication_class().authenticate(drf_request)
+            except APIException:
+                break
+            if result is not None:
+                return result[0]
+        return AnonymousUser()
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        policy = self.policies.get(request.resolver_match.route, ACCESS_PREMIUM)
+
+        if policy == ACCESS_FREE:
+            return None
+
+        is_api = request.path.startswith('/api/')
+        user = request.user
+        if is_api and not user.is_authenticated:
+            user = self._authenticate_api(request)
+
+        # 未認証ユーザーはログインページへ（APIの401はDRF側で返す）
+        if not user.is_authenticated:
+            if not is_api:
                 return redirect(reverse('login'))
-            return self.get_response(request)
+            return None
+
+        if policy == ACCESS_AUTHENTICATED:
+            return None
 
         # スーパーユーザーは無制限アクセス
-        if request.user.is_superuser:
-            return self.get_response(request)
+        if user.is_superuser:
+            return None
 
         # アクティブなサブスクリプションをチェック
-        active_subscription = Subscription.get_user_active_subscription(request.user)
+        active_subscription = Subscription.get_cached_entitlement(user)
 
         if not active_subscription:
             # APIリクエストの場合は403を返す
-            if request.path.startswith('/api/'):
-                from django.http import JsonResponse
+            if is_api:
                 return JsonResponse({
                     'error': 'サブスクリプションが必要です',
-                    'redirect': '/subscription/plans/'
+                    'redirect': reverse('subscription_plans')
                 }, status=403)
 
             # 通常のリクエストはサブスクリプションページへリダイレクト
             messages.warning(request, 'このコンテンツにアクセスするにはプレミアムプランの登録が必要です。')
-            return redirect('/subscription/plans/')
+            return redirect('subscription_plans')
 
         # サブスクリプション情報をリクエストに追加
         request.subscription = active_subscription
-
-        return self.get_response(request)
\ No newline at end of file
+        return None
@@ -1,4 +1,6 @@
 from django.db import models
+from django.db.models import Exists, Max, OuterRef
+from django.core.cache import cache
 from django.utils import timezone
 from apps.users.models import User
 
@@ -56,6 +58,131 @@ class Subscription(models.Model):
             end_date__gt=timezone.now()
         ).first()
 
+    # 利用権キャッシュの最大保持秒数（未登録ユーザーの否定キャッシュにも使用）
+    ENTITLEMENT_CACHE_TIMEOUT = 86400
+
+    @staticmethod
+    def entitlement_cache_key(user_id):
+        return f'subscription_entitlement_{user_id}'
+
+    @classmethod
+    def get_cached_entitlement(cls, user):
+        """
+        ユーザーの有効なプランと有効期限をキャッシュ経由で取得
+        キャッシュは end_date で自動的に失効し、未登録ユーザーは空の dict としてキャッシュする
+        """
+        cache_key = cls.entitlement_cache_key(user.pk)
+        entitlement = cache.get(cache_key)
+        now = timezone.now()
+
+        if entitlement is None:
+            subscription = cls.objects.filter(
+                user=user,
+                status='active',
+                end_date__gt=now
+            ).select_related('plan').first()
+
+            entitlement = {}
+            timeout = cls.ENTITLEMENT_CACHE_TIMEOUT
+            if subscription:
+                entitlement = {
+                    'subscription_id': subscription.id,
+                    'plan': {
+                        'id': subscription.plan_id,
+                        'name': subscription.plan.name,
+                    },
+                    'end_date': subscription.end_date,
+                }
+                remaining = int((subscription.end_date - now).total_seconds())
+                timeout = max(1, min(timeout, remaining))
+            cache.set(cache_key, entitlement, timeout=timeout)
+
+        # キャッシュ期限の丸め誤差で期限切れの利用権を返さない
+        if not entitlement or entitlement['end_date'] <= now:
+            return None
+        return entitlement
+
+    @classmethod
+    def invalidate_entitlement_cache(cls, user_id):
+        """サブスクリプション更新時に利用権キャッシュを破棄"""
+        cache.delete(cls.entitlement_cache_key(user_id))
+
+    @classmethod
+    def sync_user_entitlement(cls, user_id):
+        """アクティブなサブスクリプションから User.is_premium / subscription_end_date を更新"""
+        now = timezone.now()
+        end_date = cls.objects.filter(
+            user_id=user_id,
+            status='active',
+            end_date__gt=now
+        ).aggregate(end_date=Max('end_date'))['end_date']
+
+        User.objects.filter(pk=user_id).update(
+            is_premium=end_date is not None,
+            subscription_end_date=end_date,
+            updated_at=now
+        )
+        cls.invalidate_entitlement_cache(user_id)
+
+    @classmethod
+    def expire_lapsed(cls, batch_size=1000):
+        """
+        期限切れのサブスクリプションを expired にし、有効なプランがないユーザーを降格する
+        どちらも batch_size 件ずつの UPDATE で処理し、(期限切れ件数, 降格件数) を返す
+        """
+        now = timezone.now()
+
+        expired_count = 0
+        lapsed = cls.objects.filter(status='active', end_date__lte=now)
+        while True:
+            ids = list(lapsed.values_list('id', flat=True)[:batch_size])
+            if not ids:
+                break
+            expired_count += cls.objects.filter(id__in=ids).update(status='expired', updated_at=now)
+
+        downgraded_count = 0
+        has_active = cls.objects.filter(user=OuterRef('pk'), status='active', end_date__gt=now)
+        # subscription_end_date が NULL のユーザー（手動付与）は対象外
+        lapsed_users = User.objects.filter(
+            is_premium=True,
+            subscription_end_date__lte=now
+        ).exclude(Exists(has_active))
+        while True:
+            ids = list(lapsed_users.values_list('id', flat=True)[:batch_size])
+            if not ids:
+                break
+            downgraded_count += User.objects.filter(id__in=ids).update(is_premium=False, updated_at=now)
+
+        return expired_count, downgraded_count
+
+class StripeEvent(models.Model):
+    """受信した Stripe Webhook イベント（追記のみ・event_id で重複排除）"""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('processed', 'Processed'),
+        ('failed', 'Failed'),
+    ]
+
+    event_id = models.CharField(max_length=255, unique=True)
+    event_type = models.CharField(max_length=100)
+    payload = models.JSONField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    error = models.TextField(blank=True)  # 最後に失敗した処理のエラー
+    attempts = models.PositiveSmallIntegerField(default=0)  # 一時的なエラーで失敗した回数
+    next_attempt_at = models.DateTimeField(null=True, blank=True)  # 再試行までの待機（未設定なら即時）
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'stripe_events'
+        ordering = ['received_at']
+        indexes = [
+            models.Index(fields=['status', 'received_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.event_type} ({self.event_id})"
+
 class Payment(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='payments')
     subscription = models.ForeignKey(Subscription, on_delete=models.CASCADE, related_name='payments')
@@ -0,0 +1,145 @@
+from celery import shared_task
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from datetime import timedelta
+from apps.users.models import User
+from .models import SubscriptionPlan, Subscription, Payment, StripeEvent
+
+# 一時的なエラー（デッドロック・接続断など）の再試行
+MAX_ATTEMPTS = 8
+RETRY_BASE_SECONDS = 60  # 1分, 2分, 4分... と倍にしていく
+
+class InvalidStripeEvent(Exception):
+    """再試行しても成功しないイベント（不正なペイロード・存在しないユーザーやプラン）"""
+
+@shared_task
+def process_stripe_events(batch_size=100):
+    """
+    未処理の Stripe イベントを受信順にまとめて処理
+    イベント毎にセーブポイントを切る。不正なイベントは failed とし、
+    一時的なエラーは pending のまま待機時間を延ばして MAX_ATTEMPTS 回まで再試行する
+    """
+    synced_user_ids = set()
+    now = timezone.now()
+
+    with transaction.atomic():
+        events = list(
+            StripeEvent.objects.select_for_update(skip_locked=True)
+            .filter(status='pending')
+            .filter(Q(next_attempt_at__isnull=True) | Q(next_attempt_at__lte=now))
+            .order_by('received_at')[:batch_size]
+        )
+        if not events:
+            return 0
+
+        # バッチ内で参照するユーザーとプランを一括取得
+        # 不正なペイロードはここでは読み飛ばし、下のイベント毎の処理で failed にする
+        user_ids, plan_ids = set(), set()
+        for event in events:
+            if event.event_type != 'checkout.session.completed':
+                continue
+            try:
+                ids = _checkout_ids(event.payload)
+            except (KeyError, TypeError, ValueError, AttributeError):
+                continue
+            if ids:
+                user_ids.add(ids[0])
+                plan_ids.add(ids[1])
+        users = User.objects.in_bulk(user_ids)
+        plans = SubscriptionPlan.objects.in_bulk(plan_ids)
+
+        for event in events:
+            try:
+                with transaction.atomic():
+                    if event.event_type == 'checkout.session.completed':
+                        user_id = _handle_checkout_completed(event.payload, users, plans)
+                        if user_id:
+                            synced_user_ids.add(user_id)
+                event.status = 'processed'
+                event.processed_at = now
+            except InvalidStripeEvent as e:
+                event.status = 'failed'
+                event.error = str(e)
+                event.processed_at = now
+            except Exception as e:
+                event.attempts += 1
+                event.error = f'{type(e).__name__}: {e}'
+                if event.attempts >= MAX_ATTEMPTS:
+                    event.status = 'failed'
+                    event.processed_at = now
+                else:
+                    event.next_attempt_at = now + timedelta(seconds=RETRY_BASE_SECONDS * 2 ** (event.attempts - 1))
+
+        StripeEvent.objects.bulk_update(
+            events, ['status', 'error', 'attempts', 'next_attempt_at', 'processed_at']
+        )
+
+    for user_id in synced_user_ids:
+        Subscription.sync_user_entitlement(user_id)
+
+    # バッチが満杯なら残りを続けて処理
+    if len(events) == batch_size:
+        process_stripe_events.delay(batch_size)
+
+    return len(events)
+
+def _checkout_ids(payload):
+    """
+    checkout.session.completed のメタデータから (user_id, plan_id) を取得
+    指定がなければ None、不正なペイロードや ID は例外を送出
+    """
+    metadata = payload['data']['object'].get('metadata') or {}
+    user_id = metadata.get('user_id')
+    plan_id = metadata.get('plan_id')
+    if not (user_id and plan_id):
+        return None
+    return int(user_id), int(plan_id)
+
+def _handle_checkout_completed(payload, users, plans):
+    """チェックアウト完了時の処理。サブスクリプションを作成したユーザーIDを返す"""
+    try:
+        session = payload['data']['object']
+        ids = _checkout_ids(payload)
+    except (KeyError, TypeError, ValueError, AttributeError) as e:
+        raise InvalidStripeEvent(f'Malformed checkout payload: {e!r}') from e
+    if ids is None:
+        return None
+
+    user_id, plan_id = ids
+    user = users.get(user_id)
+    plan = plans.get(plan_id)
+    if user is None:
+        raise InvalidStripeEvent(f'User {user_id} not found')
+    if plan is None:
+        raise InvalidStripeEvent(f'SubscriptionPlan {plan_id} not found')
+
+    # 既存のアクティブなサブスクリプションをキャンセル
+    Subscription.objects.filter(user=user, status='active').update(status='cancelled')
+
+    # 新しいサブスクリプション作成
+    start_date = timezone.now()
+    subscription = Subscription.objects.create(
+        user=user,
+        plan=plan,
+        status='active',
+        start_date=start_date,
+        end_date=start_date + timedelta(days=plan.duration_days),
+        stripe_subscription_id=session.get('subscription') or ''
+    )
+
+    Payment.objects.create(
+        user=user,
+        subscription=subscription,
+        amount=plan.price,
+        currency='JPY',
+        stripe_payment_intent_id=session.get('payment_intent') or '',
+        status='completed'
+    )
+
+    return user.id
+
+@shared_task
+def expire_subscriptions(batch_size=1000):
+    """期限切れサブスクリプションの定期処理"""
+    return Subscription.expire_lapsed(batch_size=batch_size)
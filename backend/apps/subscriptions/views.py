@@ -9,22 +9,24 @@ from django.contrib import messages
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
-from django.utils import timezone
-from datetime import timedelta
-from .models import SubscriptionPlan, Subscription, Payment
+from django.db import transaction
+from .models import SubscriptionPlan, Subscription, Payment, StripeEvent
 from .serializers import SubscriptionPlanSerializer, SubscriptionSerializer, PaymentSerializer
-from .decorators import subscription_required
+from .decorators import subscription_required, access_policy, ACCESS_FREE, ACCESS_AUTHENTICATED
+from .tasks import process_stripe_events
 import stripe
 import json
 
 stripe.api_key = settings.STRIPE_SECRET_KEY if hasattr(settings, 'STRIPE_SECRET_KEY') else None
 
 class SubscriptionPlanViewSet(viewsets.ReadOnlyModelViewSet):
+    access_policy = ACCESS_FREE
     queryset = SubscriptionPlan.objects.filter(is_active=True)
     serializer_class = SubscriptionPlanSerializer
     permission_classes = [AllowAny]
 
 class SubscriptionViewSet(viewsets.ModelViewSet):
+    access_policy = ACCESS_AUTHENTICATED
     serializer_class = SubscriptionSerializer
     permission_classes = [IsAuthenticated]
 
@@ -70,11 +72,13 @@ class SubscriptionViewSet(viewsets.ModelViewSet):
                 )
             subscription.status = 'cancelled'
             subscription.save()
+            Subscription.sync_user_entitlement(subscription.user_id)
             return Response({'status': 'cancelled'})
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
 class PaymentViewSet(viewsets.ReadOnlyModelViewSet):
+    access_policy = ACCESS_AUTHENTICATED
     serializer_class = PaymentSerializer
     permission_classes = [IsAuthenticated]
 
@@ -84,10 +88,11 @@ class PaymentViewSet(viewsets.ReadOnlyModelViewSet):
 
 # Web View Functions
 @login_required
+@access_policy(ACCESS_AUTHENTICATED)
 def subscription_plans_view(request):
     """サブスクリプションプラン一覧表示"""
     plans = SubscriptionPlan.objects.filter(is_active=True)
-    current_subscription = Subscription.get_user_active_subscription(request.user)
+    current_subscription = Subscription.get_cached_entitlement(request.user)
 
     context = {
         'plans': plans,
@@ -97,6 +102,7 @@ def subscription_plans_view(request):
     return render(request, 'subscriptions/plans.html', context)
 
 
+@access_policy(ACCESS_FREE)
 @csrf_exempt
 @require_POST
 def stripe_webhook(request):
@@ -116,47 +122,22 @@ def stripe_webhook(request):
     except stripe.error.SignatureVerificationError:
         return JsonResponse({'error': 'Invalid signature'}, status=400)
 
-    # チェックアウト完了時の処理
-    if event['type'] == 'checkout.session.completed':
-        session = event['data']['object']
-        user_id = session.get('metadata', {}).get('user_id')
-        plan_id = session.get('metadata', {}).get('plan_id')
-        stripe_subscription_id = session.get('subscription')
-
-        if user_id and plan_id:
-            from apps.users.models import User
-            try:
-                user = User.objects.get(id=user_id)
-                plan = SubscriptionPlan.objects.get(id=plan_id)
-
-                # 既存のアクティブなサブスクリプションをキャンセル
-                Subscription.objects.filter(user=user, status='active').update(status='cancelled')
-
-                # 新しいサブスクリプション作成
-                subscription = Subscription.objects.create(
-                    user=user,
-                    plan=plan,
-                    status='active',
-                    start_date=timezone.now(),
-                    end_date=timezone.now() + timedelta(days=plan.duration_days),
-                    stripe_subscription_id=stripe_subscription_id or ''
-                )
-
-                Payment.objects.create(
-                    user=user,
-                    subscription=subscription,
-                    amount=plan.price,
-                    currency='JPY',
-                    stripe_payment_intent_id=session.get('payment_intent', ''),
-                    status='completed'
-                )
-            except (User.DoesNotExist, SubscriptionPlan.DoesNotExist) as e:
-                print(f"Webhook processing error: {str(e)}")
+    # イベントを記録して即時に応答し、処理はワーカーに任せる（Stripeの再送は event_id で無視される）
+    stripe_event, created = StripeEvent.objects.get_or_create(
+        event_id=event['id'],
+        defaults={
+            'event_type': event['type'],
+            'payload': json.loads(payload),
+        }
+    )
+    if created:
+        transaction.on_commit(process_stripe_events.delay)
 
     return JsonResponse({'received': True})
 
 
 @login_required
+@access_policy(ACCESS_AUTHENTICATED)
 def subscription_success(request):
     """サブスクリプション成功ページ"""
     messages.success(request, 'プレミアムプランへの登録が完了しました！')
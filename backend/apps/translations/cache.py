@@ -0,0 +1,83 @@
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional
+
+
+class LRUCache:
+    """
+    エントリ数とバイト数の上限を持つプロセス内 LRU キャッシュ（スレッドセーフ）
+    共有キャッシュ（Redis 等）の手前に置き、ワーカー内で頻繁に使う翻訳をネットワーク往復なしで返す
+    """
+
+    def __init__(self, max_entries: int = 10000, max_bytes: int = 16 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()  # key -> (value, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    @staticmethod
+    def _size(key: str, value: str) -> int:
+        return len(key.encode()) + len(value.encode())
+
+    def get(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        return self.get_many([key]).get(key, default)
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, str]:
+        found = {}
+        with self._lock:
+            for key in keys:
+                entry = self._data.get(key)
+                if entry is None:
+                    self.misses += 1
+                    continue
+                self._data.move_to_end(key)
+                found[key] = entry[0]
+                self.hits += 1
+        return found
+
+    def set(self, key: str, value: str):
+        self.set_many({key: value})
+
+    def set_many(self, mapping: Dict[str, str]):
+        with self._lock:
+            for key, value in mapping.items():
+                size = self._size(key, value)
+                old = self._data.pop(key, None)
+                if old is not None:
+                    self._bytes -= old[1]
+                # 1件で予算を超えるものは保持しない
+                if size > self.max_bytes:
+                    continue
+                self._data[key] = (value, size)
+                self._bytes += size
+            self._evict()
+
+    def _evict(self):
+        while self._data and (len(self._data) > self.max_entries or self._bytes > self.max_bytes):
+            _, (_, size) = self._data.popitem(last=False)
+            self._bytes -= size
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        """ヒット・ミス数と現在の使用量"""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'entries': len(self._data),
+                'bytes': self._bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+            }
@@ -0,0 +1,152 @@
+"""
+Management command to pre-translate learning content offline
+Walks every content table in (updated_at, pk) order, translates each distinct
+string once per language and stores the result in the JSON translation fields
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Q
+from django.utils.html import strip_tags
+from apps.learning.models import Question, Choice, Word, SubjectItem, Chapter, StudyText
+from apps.translations.models import PretranslationCheckpoint
+from apps.translations.services import TranslationService
+from apps.users.models import User
+
+
+# (model, [(source field, translations JSON field), ...])
+CONTENT_SOURCES = [
+    (Question, [('question_text', 'translations')]),
+    (Choice, [('choice_text', 'translations')]),
+    (SubjectItem, [('name', 'translations')]),
+    (Chapter, [('name', 'translations')]),
+    (StudyText, [('content', 'translations')]),
+    (Word, [('japanese', 'translations'), ('example_sentence', 'example_translation')]),
+]
+
+
+class Command(BaseCommand):
+    help = 'Pre-translate learning content into every user language (resumable, incremental on updated_at)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--languages',
+            nargs='+',
+            default=[code for code, _ in User.LANGUAGE_CHOICES],
+            help='Target language codes (default: all User.LANGUAGE_CHOICES)'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=500,
+            help='Rows read, translated and written per transaction'
+        )
+        parser.add_argument(
+            '--reset',
+            action='store_true',
+            help='Ignore saved checkpoints and walk every row again'
+        )
+        parser.add_argument(
+            '--overwrite',
+            action='store_true',
+            help='Replace existing translations instead of only filling missing languages'
+        )
+        parser.add_argument(
+            '--allow-dictionary',
+            action='store_true',
+            help='Run even when no translation API is configured (dictionary fallback only)'
+        )
+
+    def handle(self, *args, **options):
+        self.service = TranslationService()
+        if self.service.provider is None and not options['allow_dictionary']:
+            raise CommandError(
+                'No translation API is configured (GOOGLE_TRANSLATE_API_KEY / DEEPL_API_KEY). '
+                'Use --allow-dictionary to store dictionary fallback translations.'
+            )
+
+        self.languages = options['languages']
+        self.overwrite = options['overwrite']
+
+        for model, fields in CONTENT_SOURCES:
+            label = model._meta.label
+            checkpoint, _ = PretranslationCheckpoint.objects.get_or_create(label=label)
+            if options['reset']:
+                checkpoint.last_updated_at = None
+                checkpoint.last_pk = 0
+
+            rows_done = strings_done = 0
+            while True:
+                rows, strings, failed = self.process_chunk(model, fields, checkpoint, options['chunk_size'])
+                rows_done += rows
+                strings_done += strings
+                if failed:
+                    # チェックポイントは失敗したチャンクの手前に残るため、次回の実行で再試行される
+                    self.stdout.write(self.style.WARNING(
+                        f'  {label}: {failed} strings could not be translated; stopping at the checkpoint'
+                    ))
+                    break
+                if not rows:
+                    break
+                self.stdout.write(f'  {label}: {rows_done} rows, {strings_done} strings translated')
+
+            self.stdout.write(self.style.SUCCESS(
+                f'{label}: {rows_done} rows processed, {strings_done} strings translated'
+            ))
+
+    def process_chunk(self, model, fields, checkpoint, chunk_size):
+        """
+        checkpoint より後の行を1チャンク処理し (行数, 翻訳した文字列数, 翻訳に失敗した文字列数) を返す
+        翻訳APIが返さなかった文字列は書き込まず、失敗があればチェックポイントを進めない
+        """
+        queryset = model.objects.only(
+            'pk', 'updated_at', *[name for pair in fields for name in pair]
+        ).order_by('updated_at', 'pk')
+        if checkpoint.last_updated_at is not None:
+            queryset = queryset.filter(
+                Q(updated_at__gt=checkpoint.last_updated_at)
+                | Q(updated_at=checkpoint.last_updated_at, pk__gt=checkpoint.last_pk)
+            )
+        rows = list(queryset[:chunk_size])
+        if not rows:
+            return 0, 0, 0
+
+        strings = failed = 0
+        changed = set()
+        for language in self.languages:
+            # 未翻訳の (行, フィールド) を原文ごとにまとめ、同じ原文は1回だけ翻訳する
+            pending = {}
+            for row in rows:
+                for source_field, target_field in fields:
+                    text = strip_tags(getattr(row, source_field) or '').strip()
+                    translations = getattr(row, target_field) or {}
+                    if text and (self.overwrite or not translations.get(language)):
+                        pending.setdefault(text, []).append((row, target_field))
+            if not pending:
+                continue
+
+            # フォールバック訳文（[XX] 付きの原文など）は保存しない
+            translated, _ = self.service.translate_cached(list(pending), 'ja', language, include_fallbacks=False)
+            for text, targets in pending.items():
+                if text not in translated:
+                    # 辞書のみの運用で訳せない文字列は何度試しても同じなので失敗として扱わない
+                    if self.service.provider is not None:
+                        failed += 1
+                    continue
+                strings += 1
+                for row, target_field in targets:
+                    translations = getattr(row, target_field) or {}
+                    translations[language] = translated[text]
+                    setattr(row, target_field, translations)
+                    changed.add(target_field)
+
+        if not failed:
+            last = rows[-1]
+            checkpoint.last_updated_at = last.updated_at
+            checkpoint.last_pk = last.pk
+        with transaction.atomic():
+            # bulk_update は auto_now を更新しないため、書き戻した行が次回の差分に再び現れることはない
+            if changed:
+                model.objects.bulk_update(rows, sorted(changed))
+            checkpoint.save()
+
+        return len(rows), strings, failed
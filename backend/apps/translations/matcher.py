@@ -0,0 +1,95 @@
+from collections import deque
+from typing import Dict, Iterator, Tuple
+
+
+class DictionaryMatcher:
+    """
+    辞書の全エントリを1つの Aho-Corasick オートマトンにまとめた照合器
+    テキストを1回走査するだけで最左最長一致（重なりなし）の語を列挙・置換する
+    """
+
+    def __init__(self, mapping: Dict[str, str]):
+        self.mapping = dict(mapping)
+        self._goto = [{}]
+        self._fail = [0]
+        self._length = [0]  # この状態で終わる語の長さ（0 は語なし）
+        self._output = [0]  # 辞書サフィックスリンク: fail を辿って最初に語が終わる状態
+
+        for word in self.mapping:
+            if word:
+                self._add(word)
+        self._build()
+
+    def __len__(self):
+        return len(self.mapping)
+
+    def _add(self, word: str):
+        state = 0
+        for char in word:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._length.append(0)
+                self._output.append(0)
+                self._goto[state][char] = next_state
+            state = next_state
+        self._length[state] = len(word)
+
+    def _build(self):
+        """幅優先で fail リンクと辞書サフィックスリンクを計算"""
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                fail = self._goto[fail].get(char, 0)
+                self._fail[next_state] = fail
+                self._output[next_state] = fail if self._length[fail] else self._output[fail]
+
+    def _longest_at(self, text: str):
+        """各開始位置から始まる最長一致語の長さを返す"""
+        longest = [0] * len(text)
+        goto, fail, length, output = self._goto, self._fail, self._length, self._output
+        state = 0
+        for end, char in enumerate(text, 1):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+
+            match = state if length[state] else output[state]
+            while match:
+                start = end - length[match]
+                if length[match] > longest[start]:
+                    longest[start] = length[match]
+                match = output[match]
+        return longest
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, int, str]]:
+        """最左最長一致の (開始位置, 終了位置, 辞書の値) を順に返す"""
+        if not self.mapping or not text:
+            return
+        longest = self._longest_at(text)
+        position = 0
+        while position < len(text):
+            size = longest[position]
+            if size:
+                yield position, position + size, self.mapping[text[position:position + size]]
+                position += size
+            else:
+                position += 1
+
+    def replace(self, text: str) -> str:
+        """一致した語を辞書の値に置き換えたテキストを返す"""
+        parts = []
+        position = 0
+        for start, end, value in self.iter_matches(text):
+            parts.append(text[position:start])
+            parts.append(value)
+            position = end
+        parts.append(text[position:])
+        return ''.join(parts)
@@ -0,0 +1,59 @@
+import hashlib
+
+from django.db import migrations, models
+
+
+def backfill_text_hash(apps, schema_editor):
+    """既存行の text_hash を埋め、同じ (原文, 翻訳元, 翻訳先) の重複は最新の1行だけ残す"""
+    TranslationCache = apps.get_model('translations', 'TranslationCache')
+
+    seen = set()
+    duplicate_ids = []
+    batch = []
+    entries = TranslationCache.objects.only(
+        'id', 'original_text', 'source_language', 'target_language'
+    ).order_by('-updated_at', '-id')
+
+    for entry in entries.iterator(chunk_size=2000):
+        text_hash = hashlib.sha256(
+            f'{entry.source_language}\x00{entry.target_language}\x00{entry.original_text}'.encode()
+        ).hexdigest()
+        if text_hash in seen:
+            duplicate_ids.append(entry.id)
+            continue
+        seen.add(text_hash)
+        entry.text_hash = text_hash
+        batch.append(entry)
+        if len(batch) >= 1000:
+            TranslationCache.objects.bulk_update(batch, ['text_hash'])
+            batch = []
+    if batch:
+        TranslationCache.objects.bulk_update(batch, ['text_hash'])
+
+    for start in range(0, len(duplicate_ids), 1000):
+        TranslationCache.objects.filter(id__in=duplicate_ids[start:start + 1000]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('translations', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='translationcache',
+            unique_together=set(),
+        ),
+        migrations.AddField(
+            model_name='translationcache',
+            name='text_hash',
+            field=models.CharField(max_length=64, null=True),
+        ),
+        migrations.RunPython(backfill_text_hash, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='translationcache',
+            name='text_hash',
+            field=models.CharField(max_length=64, unique=True),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.2.7 on 2026-10-17 22:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('translations', '0003_translationcache_text_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PretranslationCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('label', models.CharField(max_length=100, unique=True)),
+                ('last_updated_at', models.DateTimeField(blank=True, null=True)),
+                ('last_pk', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'pretranslation_checkpoints',
+            },
+        ),
+    ]
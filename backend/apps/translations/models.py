@@ -1,3 +1,4 @@
+import hashlib
 from django.db import models
 from django.contrib.auth import get_user_model
 
@@ -5,6 +6,8 @@ User = get_user_model()
 
 class TranslationCache(models.Model):
     """翻訳結果のキャッシュ"""
+    # (原文, 翻訳元, 翻訳先) の SHA-256。検索と一意制約はこの固定長カラムで行う
+    text_hash = models.CharField(max_length=64, unique=True)
     original_text = models.TextField()
     translated_text = models.TextField()
     source_language = models.CharField(max_length=10, default='ja')
@@ -15,7 +18,6 @@ class TranslationCache(models.Model):
 
     class Meta:
         db_table = 'translation_cache'
-        unique_together = ['original_text', 'source_language', 'target_language']
         indexes = [
             models.Index(fields=['source_language', 'target_language']),
         ]
@@ -23,6 +25,15 @@ class TranslationCache(models.Model):
     def __str__(self):
         return f"{self.source_language} -> {self.target_language}: {self.original_text[:50]}..."
 
+    @staticmethod
+    def make_hash(text, source_language, target_language):
+        """text_hash の値を計算"""
+        return hashlib.sha256(f'{source_language}\x00{target_language}\x00{text}'.encode()).hexdigest()
+
+    def save(self, *args, **kwargs):
+        self.text_hash = self.make_hash(self.original_text, self.source_language, self.target_language)
+        super().save(*args, **kwargs)
+
 class UserLanguagePreference(models.Model):
     """ユーザーの言語設定"""
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='language_preference')
@@ -35,4 +46,17 @@ class UserLanguagePreference(models.Model):
         db_table = 'user_language_preferences'
 
     def __str__(self):
-        return f"{self.user.email}: {self.preferred_language}"
\ No newline at end of file
+        return f"{self.user.email}: {self.preferred_language}"
+
+class PretranslationCheckpoint(models.Model):
+    """事前翻訳（pretranslate_content）の進捗。テーブル毎に処理済みの (updated_at, pk) を記録する"""
+    label = models.CharField(max_length=100, unique=True)
+    last_updated_at = models.DateTimeField(null=True, blank=True)
+    last_pk = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'pretranslation_checkpoints'
+
+    def __str__(self):
+        return f"{self.label}: {self.last_updated_at} #{self.last_pk}"
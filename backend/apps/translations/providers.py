@@ -0,0 +1,192 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+
+
+class TranslationProviderError(Exception):
+    """外部翻訳APIの呼び出し失敗"""
+
+
+class CircuitBreaker:
+    """
+    連続失敗が閾値に達したら reset_timeout 秒間呼び出しを止めるサーキットブレーカー
+    reset_timeout 経過後は試行を許可し、成功すれば閉じ、失敗すれば再び開く
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        with self._lock:
+            return (
+                self._opened_at is not None
+                and time.monotonic() - self._opened_at < self.reset_timeout
+            )
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+
+
+class TranslationProvider:
+    """
+    外部翻訳APIの共通実装
+    テキストを max_texts_per_request 件ずつのチャンクに分け、スレッドプールで並行に送信する。
+    HTTP接続はプロバイダー単位でプールして再利用する
+    """
+
+    name = ''
+    max_texts_per_request = 50
+
+    def __init__(self, api_key: str, api_url: str, timeout: float = 5.0,
+                 max_concurrency: int = 4, breaker: Optional[CircuitBreaker] = None):
+        self.api_key = api_key
+        self.api_url = api_url
+        self.timeout = timeout
+        self.breaker = breaker or CircuitBreaker()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_concurrency)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_concurrency,
+            thread_name_prefix=f'translation-{self.name}'
+        )
+
+    def translate_many(self, texts: List[str], source_lang: str, target_lang: str) -> List[Optional[str]]:
+        """
+        テキストをまとめて翻訳
+        失敗したチャンク（回路が開いている場合を含む）の要素は None で返す
+        """
+        size = self.max_texts_per_request
+        chunks = [texts[i:i + size] for i in range(0, len(texts), size)]
+
+        futures = []
+        for chunk in chunks:
+            if self.breaker.is_open:
+                futures.append(None)
+            else:
+                futures.append(self.executor.submit(self._translate_chunk, chunk, source_lang, target_lang))
+
+        results = []
+        for chunk, future in zip(chunks, futures):
+            translated = None
+            if future is not None:
+                try:
+                    translated = future.result()
+                    if len(translated) != len(chunk):
+                        raise TranslationProviderError(f'{self.name}: unexpected response size')
+                    self.breaker.record_success()
+                except (requests.RequestException, TranslationProviderError, KeyError, ValueError):
+                    self.breaker.record_failure()
+                    translated = None
+            results.extend(translated or [None] * len(chunk))
+        return results
+
+    def _post(self, **kwargs):
+        response = self.session.post(self.api_url, timeout=self.timeout, **kwargs)
+        if response.status_code != 200:
+            raise TranslationProviderError(f'{self.name}: HTTP {response.status_code}')
+        return response.json()
+
+    def _translate_chunk(self, texts: List[str], source_lang: str, target_lang: str) -> List[str]:
+        raise NotImplementedError
+
+
+class GoogleTranslateProvider(TranslationProvider):
+    """Google Cloud Translation API (v2)"""
+
+    name = 'google'
+    max_texts_per_request = 128
+    default_api_url = 'https://translation.googleapis.com/language/translate/v2'
+
+    # Google の言語コードが異なるもの
+    LANGUAGE_CODES = {'zh': 'zh-CN'}
+
+    def _translate_chunk(self, texts, source_lang, target_lang):
+        data = self._post(
+            params={'key': self.api_key},
+            json={
+                'q': texts,
+                'source': self.LANGUAGE_CODES.get(source_lang, source_lang),
+                'target': self.LANGUAGE_CODES.get(target_lang, target_lang),
+                'format': 'text',
+            }
+        )
+        return [item['translatedText'] for item in data['data']['translations']]
+
+
+class DeepLProvider(TranslationProvider):
+    """DeepL API (v2)"""
+
+    name = 'deepl'
+    max_texts_per_request = 50
+    default_api_url = 'https://api-free.deepl.com/v2/translate'
+
+    def _translate_chunk(self, texts, source_lang, target_lang):
+        data = self._post(
+            headers={'Authorization': f'DeepL-Auth-Key {self.api_key}'},
+            data={
+                'text': texts,
+                'source_lang': source_lang.upper(),
+                'target_lang': target_lang.upper(),
+            }
+        )
+        return [item['text'] for item in data['translations']]
+
+
+_provider = None
+_provider_lock = threading.Lock()
+
+
+def get_translation_provider() -> Optional[TranslationProvider]:
+    """
+    設定に応じた翻訳プロバイダーを返す（APIキー未設定時は None）
+    接続プール・スレッドプール・サーキットブレーカーを共有するためプロセス内で1つだけ生成する
+    """
+    global _provider
+    if _provider is not None:
+        return _provider
+
+    google_api_key = getattr(settings, 'GOOGLE_TRANSLATE_API_KEY', None)
+    deepl_api_key = getattr(settings, 'DEEPL_API_KEY', None)
+    if google_api_key:
+        provider_class, api_key = GoogleTranslateProvider, google_api_key
+        api_url = getattr(settings, 'GOOGLE_TRANSLATE_API_URL', None)
+    elif deepl_api_key:
+        provider_class, api_key = DeepLProvider, deepl_api_key
+        api_url = getattr(settings, 'DEEPL_API_URL', None)
+    else:
+        return None
+
+    with _provider_lock:
+        if _provider is None:
+            _provider = provider_class(
+                api_key=api_key,
+                api_url=api_url or provider_class.default_api_url,
+                timeout=getattr(settings, 'TRANSLATION_API_TIMEOUT', 5.0),
+                max_concurrency=getattr(settings, 'TRANSLATION_API_MAX_CONCURRENCY', 4),
+                breaker=CircuitBreaker(
+                    failure_threshold=getattr(settings, 'TRANSLATION_CIRCUIT_FAILURE_THRESHOLD', 5),
+                    reset_timeout=getattr(settings, 'TRANSLATION_CIRCUIT_RESET_SECONDS', 30.0),
+                ),
+            )
+    return _provider
@@ -1,6 +1,11 @@
 import os
-from typing import Optional
+from typing import Dict, List, Optional, Set, Tuple
 from django.conf import settings
+from django.core.cache import cache
+from .cache import LRUCache
+from .models import TranslationCache
+from .matcher import DictionaryMatcher
+from .providers import get_translation_provider
 
 # 翻訳用の辞書（簡易実装）
 TRANSLATION_DICT = {
@@ -82,25 +87,164 @@ TRANSLATION_DICT = {
     }
 }
 
+# 言語ペアごとの辞書を起動時に1度だけオートマトンへコンパイル
+TRANSLATION_MATCHERS = {
+    dict_key: DictionaryMatcher(translation_dict)
+    for dict_key, translation_dict in TRANSLATION_DICT.items()
+}
+
+# ワーカープロセス内の LRU（共有キャッシュの手前の1段目）
+TRANSLATION_MEMORY_CACHE = LRUCache(
+    max_entries=getattr(settings, 'TRANSLATION_LRU_MAX_ENTRIES', 10000),
+    max_bytes=getattr(settings, 'TRANSLATION_LRU_MAX_BYTES', 16 * 1024 * 1024),
+)
+
+def translation_cache_key(text_hash: str) -> str:
+    """翻訳結果のキャッシュキー（TranslationCache.text_hash と同じダイジェストを使用）"""
+    return f"translation:{text_hash}"
+
 class TranslationService:
     """翻訳サービス"""
 
+    # 共有キャッシュ（Django cache）での訳文の保持秒数
+    SHARED_CACHE_TIMEOUT = 3600
+
     def __init__(self):
-        # Google翻訳APIキー（将来の実装用）
-        self.google_api_key = getattr(settings, 'GOOGLE_TRANSLATE_API_KEY', None)
-        # DeepL APIキー（将来の実装用）
-        self.deepl_api_key = getattr(settings, 'DEEPL_API_KEY', None)
+        # Google翻訳 / DeepL のAPIキーが設定されていれば外部APIを使用（プロセス内で共有）
+        self.provider = get_translation_provider()
 
     def translate(self, text: str, source_lang: str = 'ja', target_lang: str = 'en') -> str:
+        """テキストを翻訳"""
+        return self.translate_many([text], source_lang, target_lang)[0]
+
+    def translate_many(self, texts: List[str], source_lang: str = 'ja', target_lang: str = 'en') -> List[str]:
+        """
+        複数テキストをまとめて翻訳
+        辞書に完全一致する語はそのまま使い、残りは外部APIへチャンク単位で並行送信する。
+        APIが未設定・失敗・回路遮断中のテキストは簡易辞書による翻訳にフォールバックする
         """
-        テキストを翻訳
-        現在は簡易辞書による翻訳のみ実装
-        将来的にはGoogle翻訳APIやDeepL APIを使用
+        return [
+            translated if translated is not None else self._translate_with_dictionary(text, source_lang, target_lang)
+            for text, translated in zip(texts, self.translate_resolved(texts, source_lang, target_lang))
+        ]
+
+    def translate_resolved(self, texts: List[str], source_lang: str = 'ja',
+                           target_lang: str = 'en') -> List[Optional[str]]:
+        """
+        保存してよい訳文だけを返す translate_many
+        辞書の完全一致と外部APIの訳文、APIが未設定の場合は辞書による部分翻訳を返し、
+        APIの失敗・回路遮断中や翻訳できなかったテキストは None とする
         """
         if source_lang == target_lang:
-            return text
+            return list(texts)
+
+        translation_dict = TRANSLATION_DICT.get(f'{source_lang}_to_{target_lang}', {})
+        results = [translation_dict.get(text) for text in texts]
+
+        pending = [i for i, translated in enumerate(results) if translated is None]
+        if not pending:
+            return results
 
-        # 簡易辞書による翻訳
+        if self.provider:
+            translated = self.provider.translate_many([texts[i] for i in pending], source_lang, target_lang)
+            for i, translated_text in zip(pending, translated):
+                results[i] = translated_text
+        else:
+            # 辞書のみで運用している場合は部分翻訳も正式な訳文として扱う
+            for i in pending:
+                translated_text = self._translate_with_dictionary(texts[i], source_lang, target_lang)
+                if translated_text != self._untranslated(texts[i], target_lang):
+                    results[i] = translated_text
+        return results
+
+    def translate_cached(self, texts: List[str], source_lang: str = 'ja', target_lang: str = 'en',
+                         include_fallbacks: bool = True) -> Tuple[Dict[str, str], Set[str]]:
+        """
+        プロセス内 LRU → 共有キャッシュ → TranslationCache → 翻訳 の順に一括で解決する読み込みAPI
+        下位の層で見つかった訳文は上位の層にも保存する。
+        (原文→訳文の dict, キャッシュ・DBから取得した原文の set) を返す。翻訳に失敗した原文は dict に含まれない
+        翻訳できなかった原文のフォールバック訳文（簡易辞書・[XX] 付きの原文）はどの層にも保存せず、
+        include_fallbacks が False の場合は dict にも含めない
+        """
+        # 重複を除いたテキストごとのダイジェストとキャッシュキー
+        text_hashes = {text: TranslationCache.make_hash(text, source_lang, target_lang) for text in texts}
+        cache_keys = {text: translation_cache_key(text_hash) for text, text_hash in text_hashes.items()}
+
+        # プロセス内 LRU から取得
+        local_hits = TRANSLATION_MEMORY_CACHE.get_many(cache_keys.values())
+        translations = {
+            text: local_hits[key] for text, key in cache_keys.items() if key in local_hits
+        }
+
+        # 共有キャッシュから一括取得
+        misses = [text for text in cache_keys if text not in translations]
+        to_local = {}
+        if misses:
+            shared_hits = cache.get_many([cache_keys[text] for text in misses])
+            for text in misses:
+                key = cache_keys[text]
+                if key in shared_hits:
+                    translations[text] = shared_hits[key]
+                    to_local[key] = shared_hits[key]
+        from_cache = set(translations)
+
+        # DBキャッシュから一括取得（1クエリ）
+        misses = [text for text in misses if text not in translations]
+        to_shared = {}
+        if misses:
+            texts_by_hash = {text_hashes[text]: text for text in misses}
+            db_hits = TranslationCache.objects.filter(
+                text_hash__in=texts_by_hash
+            ).values_list('text_hash', 'translated_text')
+            for text_hash, translated in db_hits:
+                text = texts_by_hash[text_hash]
+                translations[text] = translated
+                from_cache.add(text)
+                to_shared[cache_keys[text]] = translated
+
+        # どこにもないテキストだけをまとめて翻訳
+        to_translate = [text for text in misses if text not in translations]
+        new_entries = []
+        if to_translate:
+            try:
+                translated_texts = self.translate_resolved(to_translate, source_lang, target_lang)
+            except Exception:
+                translated_texts = []
+
+            for text, translated in zip(to_translate, translated_texts):
+                if translated is None:
+                    # プロバイダ障害などの一時的なフォールバックはキャッシュしない
+                    if include_fallbacks:
+                        translations[text] = self._translate_with_dictionary(text, source_lang, target_lang)
+                    continue
+                translations[text] = translated
+                to_shared[cache_keys[text]] = translated
+                new_entries.append(TranslationCache(
+                    text_hash=text_hashes[text],
+                    original_text=text,
+                    translated_text=translated,
+                    source_language=source_lang,
+                    target_language=target_lang
+                ))
+
+        # DBキャッシュ・共有キャッシュ・プロセス内 LRU にまとめて保存
+        if new_entries:
+            TranslationCache.objects.bulk_create(new_entries, ignore_conflicts=True)
+        if to_shared:
+            cache.set_many(to_shared, self.SHARED_CACHE_TIMEOUT)
+            to_local.update(to_shared)
+        if to_local:
+            TRANSLATION_MEMORY_CACHE.set_many(to_local)
+
+        return translations, from_cache
+
+    def translate_cached_one(self, text: str, source_lang: str = 'ja', target_lang: str = 'en') -> Tuple[Optional[str], bool]:
+        """1件版の translate_cached。(訳文 または None, キャッシュから取得したか) を返す"""
+        translations, from_cache = self.translate_cached([text], source_lang, target_lang)
+        return translations.get(text), text in from_cache
+
+    def _translate_with_dictionary(self, text: str, source_lang: str, target_lang: str) -> str:
+        """簡易辞書による翻訳"""
         dict_key = f'{source_lang}_to_{target_lang}'
         if dict_key in TRANSLATION_DICT:
             translation_dict = TRANSLATION_DICT[dict_key]
@@ -109,32 +253,19 @@ class TranslationService:
             if text in translation_dict:
                 return translation_dict[text]
 
-            # 部分的な翻訳を試みる
-            translated_text = text
-            for ja_word, translated_word in translation_dict.items():
-                translated_text = translated_text.replace(ja_word, translated_word)
+            # 部分的な翻訳を試みる（最左最長一致で1パス置換）
+            translated_text = TRANSLATION_MATCHERS[dict_key].replace(text)
 
             if translated_text != text:
                 return translated_text
 
-        # 将来的にはここで外部APIを呼び出す
-        # if self.google_api_key:
-        #     return self._translate_with_google(text, source_lang, target_lang)
-        # elif self.deepl_api_key:
-        #     return self._translate_with_deepl(text, source_lang, target_lang)
-
         # 翻訳できない場合は元のテキストを返す
-        return f"[{target_lang.upper()}] {text}"
-
-    def _translate_with_google(self, text: str, source_lang: str, target_lang: str) -> str:
-        """Google翻訳APIを使用した翻訳（未実装）"""
-        # TODO: Google Translate API実装
-        pass
+        return self._untranslated(text, target_lang)
 
-    def _translate_with_deepl(self, text: str, source_lang: str, target_lang: str) -> str:
-        """DeepL APIを使用した翻訳（未実装）"""
-        # TODO: DeepL API実装
-        pass
+    @staticmethod
+    def _untranslated(text: str, target_lang: str) -> str:
+        """翻訳できなかったテキストの表示形式"""
+        return f"[{target_lang.upper()}] {text}"
 
     def detect_language(self, text: str) -> str:
         """言語を検出"""
@@ -0,0 +1,17 @@
+from django import template
+from apps.translations.services import TranslationService
+
+register = template.Library()
+
+
+@register.simple_tag
+def translate_ui(text, target_language='en', source_language='ja'):
+    """
+    サーバー側レンダリング用のUI文字列翻訳
+    {% translate_ui "単語帳" user.native_language %}
+    API と同じ読み込み経路（プロセス内 LRU → 共有キャッシュ → DB → 翻訳）を使い、失敗時は原文を返す
+    """
+    if not text or not target_language or source_language == target_language:
+        return text
+    translated, _ = TranslationService().translate_cached_one(text, source_language, target_language)
+    return translated if translated is not None else text
@@ -2,14 +2,14 @@ from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
-from django.core.cache import cache
 from django.conf import settings
-import hashlib
+from apps.subscriptions.decorators import access_policy, ACCESS_AUTHENTICATED
 import json
 
-from .models import TranslationCache, UserLanguagePreference
+from .models import UserLanguagePreference
 from .services import TranslationService
 
+@access_policy(ACCESS_AUTHENTICATED)
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def translate_text(request):
@@ -21,121 +21,68 @@ def translate_text(request):
     if not text:
         return Response({'error': 'Text is required'}, status=status.HTTP_400_BAD_REQUEST)
 
-    # キャッシュキー生成
-    cache_key = f"translation:{hashlib.md5(f'{text}:{source_language}:{target_language}'.encode()).hexdigest()}"
-
-    # キャッシュから取得
-    cached_translation = cache.get(cache_key)
-    if cached_translation:
-        return Response({
-            'translated_text': cached_translation,
-            'source_language': source_language,
-            'target_language': target_language,
-            'from_cache': True
-        })
-
-    # DBキャッシュから取得
-    try:
-        db_cache = TranslationCache.objects.get(
-            original_text=text,
-            source_language=source_language,
-            target_language=target_language
-        )
-        # メモリキャッシュに保存
-        cache.set(cache_key, db_cache.translated_text, 3600)
-        return Response({
-            'translated_text': db_cache.translated_text,
-            'source_language': source_language,
-            'target_language': target_language,
-            'from_cache': True
-        })
-    except TranslationCache.DoesNotExist:
-        pass
-
-    # 翻訳サービスを使用
+    # プロセス内 LRU → 共有キャッシュ → DBキャッシュ → 翻訳サービス の順に参照
     translation_service = TranslationService()
     try:
-        translated_text = translation_service.translate(text, source_language, target_language)
-
-        # DBキャッシュに保存
-        TranslationCache.objects.update_or_create(
-            original_text=text,
-            source_language=source_language,
-            target_language=target_language,
-            defaults={'translated_text': translated_text}
-        )
-
-        # メモリキャッシュに保存
-        cache.set(cache_key, translated_text, 3600)
-
-        return Response({
-            'translated_text': translated_text,
-            'source_language': source_language,
-            'target_language': target_language,
-            'from_cache': False
-        })
+        translated_text, from_cache = translation_service.translate_cached_one(text, source_language, target_language)
+        if translated_text is None:
+            raise ValueError('Translation failed')
     except Exception as e:
         return Response({
             'error': str(e),
             'translated_text': text  # エラー時は元のテキストを返す
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+    return Response({
+        'translated_text': translated_text,
+        'source_language': source_language,
+        'target_language': target_language,
+        'from_cache': from_cache
+    })
+
+@access_policy(ACCESS_AUTHENTICATED)
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def translate_batch(request):
-    """複数テキストの一括翻訳"""
+    """
+    複数テキストの一括翻訳
+    各キャッシュ層をまとめて参照し、どこにもないテキストだけを翻訳する
+    """
     texts = request.data.get('texts', [])
     target_language = request.data.get('target_language', 'en')
     source_language = request.data.get('source_language', 'ja')
 
-    if not texts:
+    if not texts or not isinstance(texts, list):
         return Response({'error': 'Texts array is required'}, status=status.HTTP_400_BAD_REQUEST)
 
-    results = []
+    # 文字列以外の要素は翻訳せず、その要素だけエラーとして返す
     translation_service = TranslationService()
+    translations, from_cache = translation_service.translate_cached(
+        [text for text in texts if isinstance(text, str)], source_language, target_language
+    )
 
+    results = []
     for text in texts:
-        # キャッシュチェック
-        cache_key = f"translation:{hashlib.md5(f'{text}:{source_language}:{target_language}'.encode()).hexdigest()}"
-        cached = cache.get(cache_key)
-
-        if cached:
+        if not isinstance(text, str) or text not in translations:
             results.append({
                 'original': text,
-                'translated': cached,
-                'from_cache': True
+                'translated': text,  # エラー時は元のテキスト
+                'from_cache': False,
+                'error': True
             })
         else:
-            try:
-                translated = translation_service.translate(text, source_language, target_language)
-                cache.set(cache_key, translated, 3600)
-
-                # DBキャッシュに保存
-                TranslationCache.objects.update_or_create(
-                    original_text=text,
-                    source_language=source_language,
-                    target_language=target_language,
-                    defaults={'translated_text': translated}
-                )
-
-                results.append({
-                    'original': text,
-                    'translated': translated,
-                    'from_cache': False
-                })
-            except Exception:
-                results.append({
-                    'original': text,
-                    'translated': text,  # エラー時は元のテキスト
-                    'from_cache': False,
-                    'error': True
-                })
+            results.append({
+                'original': text,
+                'translated': translations[text],
+                'from_cache': text in from_cache
+            })
 
     return Response({
         'translations': results,
         'target_language': target_language
     })
 
+@access_policy(ACCESS_AUTHENTICATED)
 @api_view(['GET', 'PUT'])
 @permission_classes([IsAuthenticated])
 def language_preference(request):
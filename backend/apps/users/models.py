@@ -1,5 +1,6 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.utils import timezone
 
 class User(AbstractUser):
     LANGUAGE_CHOICES = [
@@ -29,6 +30,15 @@ class User(AbstractUser):
         verbose_name = 'User'
         verbose_name_plural = 'Users'
 
+    def has_premium_access(self):
+        """
+        非正規化された is_premium / subscription_end_date から利用権を判定
+        subscriptions テーブルは参照しない（end_date が NULL の場合は手動付与として扱う）
+        """
+        if not self.is_premium:
+            return False
+        return self.subscription_end_date is None or self.subscription_end_date > timezone.now()
+
 class UserProgress(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='progress')
     content_type = models.CharField(max_length=50)
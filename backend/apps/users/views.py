@@ -2,10 +2,12 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from apps.subscriptions.decorators import ACCESS_AUTHENTICATED
 from .models import User, UserProgress
 from .serializers import UserSerializer, UserProgressSerializer
 
 class UserViewSet(viewsets.ModelViewSet):
+    access_policy = ACCESS_AUTHENTICATED
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = [IsAuthenticated]
@@ -29,6 +31,7 @@ class UserViewSet(viewsets.ModelViewSet):
         return Response({'error': 'Invalid language'}, status=status.HTTP_400_BAD_REQUEST)
 
 class UserProgressViewSet(viewsets.ModelViewSet):
+    access_policy = ACCESS_AUTHENTICATED
     serializer_class = UserProgressSerializer
     permission_classes = [IsAuthenticated]
 
@@ -1,15 +1,9 @@
-from functools import wraps
-from django.shortcuts import redirect
-from django.contrib import messages
-from django.urls import reverse
+from apps.subscriptions.decorators import ACCESS_FREE
 
 def allow_free_access(view_func):
     """
     無料アクセス可能なビューを示すデコレーター
-    ミドルウェアでのチェックをスキップする
+    ミドルウェアのアクセスポリシー表で無料ルートとして登録される
     """
-    @wraps(view_func)
-    def wrapper(request, *args, **kwargs):
-        request.skip_subscription_check = True
-        return view_func(request, *args, **kwargs)
-    return wrapper
\ No newline at end of file
+    view_func.access_policy = ACCESS_FREE
+    return view_func
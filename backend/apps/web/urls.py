@@ -23,7 +23,9 @@ urlpatterns = [
     # 暗記カード（フラッシュカード）
     path('flashcards/', views.flashcards_view, name='flashcards'),
     path('flashcards/<int:deck_id>/study/', views.flashcards_study_view, name='flashcards_study'),
+    path('flashcards/<int:deck_id>/cards/', views.flashcards_study_cards, name='flashcards_study_cards'),
     path('flashcards/update/<int:card_id>/', views.flashcards_update_progress, name='flashcards_update_progress'),
+    path('flashcards/reviews/', views.flashcards_submit_reviews, name='flashcards_submit_reviews'),
     # CSV インポート
     path('admin/csv-import/', views.csv_import_view, name='csv_import'),
 ]
\ No newline at end of file
@@ -6,6 +6,7 @@ from django.views.generic import TemplateView
 from django.contrib.auth.forms import AuthenticationForm
 from django.contrib.auth import get_user_model
 from django import forms
+from apps.subscriptions.decorators import access_policy, ACCESS_AUTHENTICATED
 from .decorators import allow_free_access
 
 User = get_user_model()
@@ -50,11 +51,13 @@ class UserRegistrationForm(forms.ModelForm):
 class LandingPageView(TemplateView):
     template_name = 'landing.html'
 
+@allow_free_access
 def landing_view(request):
     if request.user.is_authenticated:
         return redirect('dashboard')
     return render(request, 'landing.html')
 
+@allow_free_access
 def login_view(request):
     if request.user.is_authenticated:
         return redirect('dashboard')
@@ -78,6 +81,7 @@ def login_view(request):
 
     return render(request, 'registration/login.html', {'form': form})
 
+@allow_free_access
 def register_view(request):
     if request.user.is_authenticated:
         return redirect('dashboard')
@@ -96,6 +100,7 @@ def register_view(request):
 
     return render(request, 'registration/register.html', {'form': form})
 
+@allow_free_access
 def logout_view(request):
     logout(request)
     messages.success(request, 'ログアウトしました。')
@@ -107,7 +112,7 @@ def dashboard_view(request):
     """ダッシュボードは無料ユーザーもアクセス可能"""
     # ユーザーのサブスクリプション状態を取得
     from apps.subscriptions.models import Subscription
-    active_subscription = Subscription.get_user_active_subscription(request.user)
+    active_subscription = Subscription.get_cached_entitlement(request.user)
 
     return render(request, 'dashboard.html', {
         'user': request.user,
@@ -266,6 +271,7 @@ def quiz_view(request, year, session_number):
         'user': request.user
     })
 
+@allow_free_access
 def redirect_to_correct_session(request):
     """古いセッション番号を正しいセッション番号にリダイレクト"""
     from django.shortcuts import redirect
@@ -276,22 +282,15 @@ def redirect_to_correct_session(request):
 def kotoba_view(request):
     """ことば（語彙学習）メインページ"""
     from apps.learning.models import KotobaCategory
-    from django.core.cache import cache
-    from django.db.models import Count
-
-    # Try to get from cache
-    cache_key = 'kotoba_categories_all'
-    categories = cache.get(cache_key)
-
-    if not categories:
-        # Load from database with word counts
-        categories = list(KotobaCategory.objects.all().annotate(
-            word_count=Count('words')
-        ).values(
+    from apps.learning.kotoba_cache import cached_fill
+
+    def load_categories():
+        # Load from database (word_count is a maintained column)
+        categories = KotobaCategory.objects.all().values(
             'category_key', 'japanese_name', 'indonesian_translation', 'ruby_reading', 'order_number', 'word_count'
-        ))
+        )
         # Transform to match template expectations
-        categories = [{
+        return [{
             'key': cat['category_key'],
             'japanese': cat['japanese_name'],
             'indonesian': cat['indonesian_translation'],
@@ -299,8 +298,9 @@ def kotoba_view(request):
             'order': cat['order_number'],
             'word_count': cat['word_count']
         } for cat in categories]
-        # Cache for 1 hour
-        cache.set(cache_key, categories, timeout=3600)
+
+    # Cached until Kotoba content changes (generation-keyed, single-flight fill)
+    categories = cached_fill('kotoba_categories_all', load_categories)
 
     return render(request, 'kotoba/main.html', {
         'categories': categories,
@@ -311,10 +311,9 @@ def kotoba_view(request):
 @allow_free_access
 def kotoba_category_view(request, category_key):
     """ことば カテゴリー詳細ページ（サブカテゴリー一覧）"""
-    from apps.learning.models import KotobaCategory, KotobaSubcategory, KotobaWord
+    from apps.learning.models import KotobaCategory, KotobaSubcategory
+    from apps.learning.kotoba_cache import cached_fill
     from django.http import Http404
-    from django.core.cache import cache
-    from django.db.models import Count
 
     # Get category with caching
     try:
@@ -322,19 +321,14 @@ def kotoba_category_view(request, category_key):
     except KotobaCategory.DoesNotExist:
         raise Http404("Category not found")
 
-    # Try to get subcategories from cache
-    cache_key = f'kotoba_subcategories_{category_key}'
-    subcategories = cache.get(cache_key)
-
-    if not subcategories:
-        # Load from database with word counts
-        subcategories = list(
-            KotobaSubcategory.objects.filter(main_category=category)
-            .annotate(word_count=Count('words'))
+    def load_subcategories():
+        # Load from database (word_count is a maintained column)
+        subcategories = (
+            KotobaSubcategory.objects.filter(main_category_id=category.category_key)
             .values('subcategory_key', 'japanese_name', 'indonesian_translation', 'ruby_reading', 'order_number', 'word_count')
         )
         # Transform to match template expectations
-        subcategories = [{
+        return [{
             'key': sub['subcategory_key'],
             'japanese': sub['japanese_name'],
             'indonesian': sub['indonesian_translation'],
@@ -342,8 +336,9 @@ def kotoba_category_view(request, category_key):
             'order': sub['order_number'],
             'word_count': sub['word_count']
         } for sub in subcategories]
-        # Cache for 1 hour
-        cache.set(cache_key, subcategories, timeout=3600)
+
+    # Cached until Kotoba content changes (generation-keyed, single-flight fill)
+    subcategories = cached_fill(f'kotoba_subcategories_{category_key}', load_subcategories)
 
     # Transform category to dict for template
     category_dict = {
@@ -363,91 +358,19 @@ def kotoba_category_view(request, category_key):
 @allow_free_access
 def kotoba_subcategory_view(request, category_key, subcategory_key):
     """ことば サブカテゴリー詳細ページ（単語学習）"""
-    from apps.learning.models import KotobaCategory, KotobaSubcategory, KotobaWord
+    from apps.learning.models import KotobaSubcategory, KotobaSubcategoryPayload
     from django.http import Http404
-    from django.core.cache import cache
-
-    # Get category
-    try:
-        category = KotobaCategory.get_cached(category_key)
-    except KotobaCategory.DoesNotExist:
-        raise Http404("Category not found")
 
-    # Get subcategory
+    # Prebuilt category/subcategory/words document (cache, then one keyed row read)
     try:
-        subcategory = KotobaSubcategory.objects.get(
-            main_category=category,
-            subcategory_key=subcategory_key
-        )
+        payload = KotobaSubcategoryPayload.get_payload(category_key, subcategory_key)
     except KotobaSubcategory.DoesNotExist:
         raise Http404("Subcategory not found")
 
-    # Try to get words from cache
-    cache_key = f'kotoba_words_{category_key}_{subcategory_key}'
-    words = cache.get(cache_key)
-
-    if not words:
-        # Load from database with related data
-        word_objects = KotobaWord.objects.filter(
-            main_category=category,
-            subcategory=subcategory
-        ).prefetch_related('examples__vocabulary').order_by('japanese_word')
-
-        # Transform to dict for template
-        words = []
-        for word in word_objects:
-            word_dict = {
-                'id': word.word_id,
-                'japanese': word.japanese_word,
-                'ruby': word.ruby_reading,
-                'indonesian': word.indonesian_translation,
-                'examples': []
-            }
-
-            # Add examples
-            for example in word.examples.all():
-                example_dict = {
-                    'id': example.example_id,
-                    'japanese': example.japanese_example,
-                    'indonesian': example.indonesian_example,
-                    'order': example.order_number,
-                    'vocabulary': []
-                }
-
-                # Add vocabulary
-                for vocab in example.vocabulary.all():
-                    example_dict['vocabulary'].append({
-                        'japanese': vocab.japanese_word,
-                        'ruby': vocab.ruby_reading,
-                        'indonesian': vocab.indonesian_translation
-                    })
-
-                word_dict['examples'].append(example_dict)
-
-            words.append(word_dict)
-
-        # Cache for 1 hour
-        cache.set(cache_key, words, timeout=3600)
-
-    # Transform category and subcategory to dict for template
-    category_dict = {
-        'key': category.category_key,
-        'japanese': category.japanese_name,
-        'indonesian': category.indonesian_translation,
-        'ruby': category.ruby_reading
-    }
-
-    subcategory_dict = {
-        'key': subcategory.subcategory_key,
-        'japanese': subcategory.japanese_name,
-        'indonesian': subcategory.indonesian_translation,
-        'ruby': subcategory.ruby_reading
-    }
-
     return render(request, 'kotoba/subcategory.html', {
-        'category': category_dict,
-        'subcategory': subcategory_dict,
-        'words': words,
+        'category': payload['category'],
+        'subcategory': payload['subcategory'],
+        'words': payload['words'],
         'user': request.user
     })
 
@@ -731,19 +654,20 @@ def chapter_learning_view(request, subject_name):
 def flashcards_view(request):
     """暗記カード（フラッシュカード）メインページ"""
     from apps.learning.models import FlashcardDeck
-    from django.db.models import Count
+    from apps.learning import scheduler
+
+    # Get all active decks (card_count is a maintained column)
+    decks = list(FlashcardDeck.objects.filter(is_active=True).order_by('order', 'name'))
 
-    # Get all active decks with card counts
-    decks = FlashcardDeck.objects.filter(is_active=True).annotate(
-        card_count=Count('cards')
-    ).order_by('order', 'name')
+    # Per-user due/new/learning/mastered counts for every deck in one grouped query
+    summaries = scheduler.deck_summaries(request.user, decks)
 
-    # Get deck data with card counts
     deck_data = []
     for deck in decks:
         deck_data.append({
             'deck': deck,
-            'total_cards': deck.card_count
+            'total_cards': deck.card_count,
+            **summaries[deck.id]
         })
 
     return render(request, 'flashcards/main.html', {
@@ -755,69 +679,108 @@ def flashcards_view(request):
 @allow_free_access
 def flashcards_study_view(request, deck_id):
     """暗記カード学習ページ"""
-    from apps.learning.models import FlashcardDeck, FlashcardCard
+    from apps.learning.models import FlashcardDeck
+    from apps.learning import scheduler
     from django.shortcuts import get_object_or_404
 
     deck = get_object_or_404(FlashcardDeck, id=deck_id, is_active=True)
 
-    # Get all cards in deck
-    all_cards = FlashcardCard.objects.filter(deck=deck).order_by('order')
-
-    cards_to_review = []
-    for card in all_cards:
-        cards_to_review.append({
-            'card': card,
-            'is_new': False
-        })
+    # Only the first window of due and unseen cards is rendered; the page
+    # fetches the rest from flashcards_study_cards
+    first_window = scheduler.study_window_data(request.user, deck)
 
     return render(request, 'flashcards/study.html', {
         'deck': deck,
-        'cards_to_review': cards_to_review,
-        'total_cards': all_cards.count(),
+        'first_window': first_window,
         'user': request.user
     })
 
 @login_required
+@allow_free_access
+def flashcards_study_cards(request, deck_id):
+    """暗記カード学習ページの次のカード（?after=order:id 以降）"""
+    from apps.learning.models import FlashcardDeck
+    from apps.learning import scheduler
+    from django.shortcuts import get_object_or_404
+    from django.http import JsonResponse
+
+    deck = get_object_or_404(FlashcardDeck, id=deck_id, is_active=True)
+
+    try:
+        after = scheduler.parse_study_position(request.GET.get('after', ''))
+    except ValueError:
+        return JsonResponse({'error': 'after must be "order:id"'}, status=400)
+
+    return JsonResponse(scheduler.study_window_data(request.user, deck, after=after))
+
+@login_required
+@allow_free_access
 def flashcards_update_progress(request, card_id):
-    """Update flashcard progress - simple review count only"""
+    """Apply an Again/Hard/Good/Easy grade to the user's SM-2 schedule for a card"""
     from apps.learning.models import FlashcardCard, UserFlashcardProgress
+    from apps.learning import scheduler
     from django.shortcuts import get_object_or_404
     from django.http import JsonResponse
+    from django.db import transaction
     from django.utils import timezone
 
     if request.method != 'POST':
         return JsonResponse({'error': 'POST required'}, status=400)
 
-    card = get_object_or_404(FlashcardCard, id=card_id)
+    try:
+        grade = scheduler.parse_grade(request.POST.get('grade', ''))
+    except ValueError:
+        return JsonResponse({'error': 'grade must be 1-4'}, status=400)
 
-    # Get or create progress
-    progress, created = UserFlashcardProgress.objects.get_or_create(
-        user=request.user,
-        card=card,
-        defaults={
-            'ease_factor': 2.5,
-            'interval_days': 0,
-            'repetitions': 0
-        }
-    )
+    card = get_object_or_404(FlashcardCard, id=card_id)
 
-    # Simple review count increment
-    progress.total_reviews += 1
-    progress.last_reviewed = timezone.now()
-    progress.save()
+    with transaction.atomic():
+        progress, created = UserFlashcardProgress.objects.select_for_update().get_or_create(
+            user=request.user,
+            card=card
+        )
+        reviewed_at = timezone.now()
+        scheduler.log_entry(progress, card.deck_id, grade, reviewed_at).save()
+        scheduler.review(progress, grade, reviewed_at, scheduler.get_parameters(request.user, [card.deck_id])[card.deck_id])
+        progress.save()
 
     return JsonResponse({
         'success': True,
-<<<<<<< HEAD
-        'total_reviews': progress.total_reviews
-    })
-=======
-        'next_review_date': progress.next_review_date.isoformat(),
+        'total_reviews': progress.total_reviews,
         'interval_days': progress.interval_days,
+        'next_review_date': progress.next_review_date.isoformat(),
         'is_mastered': progress.is_mastered
     })
 
 @login_required
+@allow_free_access
+def flashcards_submit_reviews(request):
+    """Apply a batch of graded reviews queued by the study page (idempotent per event_id)"""
+    import json
+    from apps.learning import scheduler
+    from django.http import JsonResponse
+    from django.db import IntegrityError
+
+    if request.method != 'POST':
+        return JsonResponse({'error': 'POST required'}, status=400)
+
+    try:
+        reviews = json.loads(request.body).get('reviews')
+    except (ValueError, AttributeError):
+        reviews = None
+    if not isinstance(reviews, list) or len(reviews) > scheduler.MAX_BATCH_SIZE:
+        return JsonResponse({'error': f'reviews must be a list of at most {scheduler.MAX_BATCH_SIZE} events'}, status=400)
+
+    events, rejected = scheduler.parse_review_events(reviews)
+    try:
+        result = scheduler.apply_review_batch(request.user, events)
+    except IntegrityError:
+        return JsonResponse({'error': 'Batch already in progress'}, status=409)
+    result['rejected'] = rejected + result['rejected']
+    return JsonResponse(result)
+
+@login_required
+@access_policy(ACCESS_AUTHENTICATED)
 def csv_import_view(request):
     """CSV/Excelインポート画面"""
     from apps.learning.models import Question, Choice
@@ -967,4 +930,3 @@ def csv_import_view(request):
     }
 
     return render(request, 'admin/csv_import.html', context)
->>>>>>> be41f65a94a52140cb64e17df68ba2ed53fce3e0
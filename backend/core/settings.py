@@ -44,6 +44,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'allauth.account.middleware.AccountMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
+    # 認証・メッセージの後に置く（request.user と messages を使用）
+    'apps.subscriptions.middleware.SubscriptionRequiredMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
@@ -74,6 +76,23 @@ DATABASES = {
     }
 }
 
+# ワーカー間で共有するキャッシュ（REDIS_URL 未設定時はプロセス内キャッシュ）
+REDIS_URL = os.getenv('REDIS_URL', '')
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -149,6 +168,33 @@ STRIPE_SECRET_KEY = os.getenv('STRIPE_SECRET_KEY', '')
 STRIPE_PUBLISHABLE_KEY = os.getenv('STRIPE_PUBLISHABLE_KEY', '')
 STRIPE_WEBHOOK_SECRET = os.getenv('STRIPE_WEBHOOK_SECRET', '')
 
+# 外部翻訳API（キー未設定時は簡易辞書のみ。URLはローカルのスタブサーバーに向けることも可能）
+GOOGLE_TRANSLATE_API_KEY = os.getenv('GOOGLE_TRANSLATE_API_KEY', '')
+GOOGLE_TRANSLATE_API_URL = os.getenv('GOOGLE_TRANSLATE_API_URL', '')
+DEEPL_API_KEY = os.getenv('DEEPL_API_KEY', '')
+DEEPL_API_URL = os.getenv('DEEPL_API_URL', '')
+TRANSLATION_API_TIMEOUT = float(os.getenv('TRANSLATION_API_TIMEOUT', '5'))
+TRANSLATION_API_MAX_CONCURRENCY = int(os.getenv('TRANSLATION_API_MAX_CONCURRENCY', '4'))
+
+# 翻訳結果のプロセス内 LRU（共有キャッシュの手前）。ワーカー毎の上限件数とバイト数
+TRANSLATION_LRU_MAX_ENTRIES = int(os.getenv('TRANSLATION_LRU_MAX_ENTRIES', '10000'))
+TRANSLATION_LRU_MAX_BYTES = int(os.getenv('TRANSLATION_LRU_MAX_BYTES', str(16 * 1024 * 1024)))
+
+# Celery（ブローカー未設定時はタスクをプロセス内で同期実行）
+CELERY_BROKER_URL = os.getenv('CELERY_BROKER_URL', REDIS_URL)
+CELERY_TASK_ALWAYS_EAGER = not CELERY_BROKER_URL
+CELERY_TIMEZONE = TIME_ZONE
+CELERY_BEAT_SCHEDULE = {
+    'process-stripe-events': {
+        'task': 'apps.subscriptions.tasks.process_stripe_events',
+        'schedule': 60.0,
+    },
+    'expire-subscriptions': {
+        'task': 'apps.subscriptions.tasks.expire_subscriptions',
+        'schedule': 3600.0,
+    },
+}
+
 SPECTACULAR_SETTINGS = {
     'TITLE': 'Japanese Learning API',
     'DESCRIPTION': '外国人向け日本語学習WEBアプリ API',